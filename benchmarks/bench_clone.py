@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+"""
+Benchmark for fanning a panel out to many hosts: the full MathStatPanel constructor per host
+("before") against cloning one prototype with Panel.with_host ("after"). That both give the
+same json is checked by tests/test_clone.py.
+
+Usage: python benchmarks/bench_clone.py [number of hosts]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+from panel import MathStatPanel, Query
+
+link = "http://grafana/d/3AcvQxVWk/any-single-machine-status?orgId=1&var-Host="
+
+def statusPanel(host):
+    """
+    Returns: example 4's uptime panel for host, built with the constructor
+    """
+    queries = [Query(host, "System uptime", alias="uptime"), Query(host, "ICMP ping", alias="ping")]
+    return MathStatPanel(title=host + " uptime", queryArray=queries, colors=["grey", "red", "yellow", "green"],
+            thresholds="1, 1800, 172800", units="s", decimals=1, math="uptime*ping", colorBackground=True,
+            absLink=link + host)
+
+def timeFanOut(hosts, cloned):
+    """
+    Returns: panels built per second
+    """
+    start = time.perf_counter()
+    if cloned:
+        prototype = statusPanel(hosts[0])
+        panels = [prototype.with_host(host) for host in hosts]
+    else:
+        panels = [statusPanel(host) for host in hosts]
+    for panel in panels:
+        panel.getDictionary()
+    elapsed = time.perf_counter() - start
+    return len(hosts) / elapsed
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    hosts = ["host%05d" % i for i in range(n)]
+    before = timeFanOut(hosts, cloned=False)
+    after = timeFanOut(hosts, cloned=True)
+    print("hosts: %s" % n)
+    print("before (constructor per host): %10.0f panels/s" % before)
+    print("after  (prototype.with_host):  %10.0f panels/s" % after)
+    print("speedup: %.2fx" % (after / before))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""
+Benchmark for the grid layout engine: adding panels in batches, and removing panels, at
+10k panels, in row and packed mode with mixed panel sizes. The layout itself is checked by
+tests/test_layout.py.
+
+Usage: python benchmarks/bench_layout.py [number of panels]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+from dashboard import DashBoard
+from panel import GraphPanel, Query
+
+def buildPanels(n, mixed):
+    """
+    Returns: n graph panels, with a mix of sizes if mixed is set
+    """
+    sizes = [(8, 6), (6, 12), (4, 4), (10, 8)]
+    panels = []
+    for i in range(n):
+        p = GraphPanel(title="panel %s" % i, queryArray=[Query("host%05d" % i, "Processor load")])
+        if mixed:
+            h, w = sizes[i % len(sizes)]
+            p.setSize(h, w)
+        panels.append(p)
+    return panels
+
+def run(n, pack, mixed):
+    d = DashBoard(title="layout benchmark", panelsPerRow=4, pack=pack)
+    panels = buildPanels(n, mixed)
+    batch = max(1, n // 100)
+    start = time.perf_counter()
+    for i in range(0, n, batch):
+        d.addPanels(panels[i:i + batch])
+    addTime = time.perf_counter() - start
+    hosts = ["host%05d" % i for i in range(n // 2, n, 50)]
+    start = time.perf_counter()
+    removed = d.removePanels(hosts=hosts)
+    removeTime = time.perf_counter() - start
+    mode = "packed" if pack else "rows"
+    sizes = "mixed sizes" if mixed else "uniform"
+    print("%-6s %-11s add %s in %7.1f ms, remove %s in %7.1f ms" % (mode, sizes, n, addTime * 1000,
+            removed, removeTime * 1000))
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run(n, pack=False, mixed=False)
+    run(n, pack=False, mixed=True)
+    run(n, pack=True, mixed=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""
+Memory benchmark for Query objects, measured with tracemalloc.
+
+"before" is a copy of the old Query class (a plain class with a per-instance __dict__ that
+keeps whatever string objects it was given). "after" is the current slotted Query, which
+interns its strings. Host and item names are built at runtime, as they would be when read
+from zabbix or from dashboard json, so every query starts out with its own string objects.
+
+Usage: python benchmarks/bench_query_memory.py [number of queries]
+"""
+
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+from panel import Query, QueryTable
+
+class OldQuery:
+    def __init__(self, host, item, group="/.*/", application=None, mode=None, alias=None):
+        self.host = host
+        self.item = item
+        self.group = group
+        self.application = application
+        self.mode = mode
+        self.alias = alias
+
+def names(n):
+    """
+    Returns: list of n (host, item, group) tuples made of freshly built strings, 500 hosts by
+        n / 500 items
+    """
+    rows = []
+    for i in range(n):
+        host = "".join(["lab-host-", str(i % 500)])
+        item = "".join(["Item number ", str(i // 500)])
+        group = "".join(["/", ".*", "/"])
+        rows.append((host, item, group))
+    return rows
+
+def measure(build, n):
+    """
+    Returns: bytes still allocated once the input names are dropped, i.e. the queries plus any
+        strings they keep alive, and the result of build(names)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = names(n)
+    result = build(rows)
+    del rows
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    oldBytes, old = measure(lambda rows: [OldQuery(h, i, group=g, alias=h) for h, i, g in rows], n)
+    del old
+    newBytes, new = measure(lambda rows: [Query(h, i, group=g, alias=h) for h, i, g in rows], n)
+    del new
+    hosts = ["lab-host-%s" % i for i in range(500)]
+    items = ["Item number %s" % i for i in range(n // 500)]
+    tableBytes, table = measure(lambda rows: QueryTable(hosts, items, alias="host"), n)
+    print("queries: %s" % n)
+    print("before (dict-based Query):  %8.1f bytes/query" % (float(oldBytes) / n))
+    print("after  (slotted, interned): %8.1f bytes/query" % (float(newBytes) / n))
+    print("QueryTable (columnar):      %8.1f bytes/query" % (float(tableBytes) / len(table)))
+
+if __name__ == "__main__":
+    main()
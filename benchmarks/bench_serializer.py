@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+"""
+Benchmark for dashboard serialization: encode time per available encoder, and payload
+size with and without gzip.
+
+Usage: python benchmarks/bench_serializer.py [number of panels]
+"""
+
+import gzip
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import serializer
+from dashboard import DashBoard
+from panel import GraphPanel, MathStatPanel, Query
+
+def buildDashboard(n):
+    """
+    Returns: a dashboard with n panels, alternating graph and math stat panels
+    """
+    d = DashBoard(title="serializer benchmark", panelsPerRow=4)
+    panels = []
+    for i in range(n):
+        host = "host%04d" % i
+        if i % 2:
+            panels.append(GraphPanel(title="CPU " + host, queryArray=[Query(host, "Processor load")]))
+        else:
+            queries = [Query(host, "ICMP ping", alias="ping"), Query(host, "Number of logged in users", alias="users")]
+            panels.append(MathStatPanel(title="Status " + host, queryArray=queries, math="ping+users",
+                    colors=["red", "green"], thresholds="1"))
+    d.addPanels(panels)
+    return d
+
+def timeIt(function, repeat):
+    """
+    Returns: best time in seconds of repeat calls to function
+    """
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best==None or elapsed<best:
+            best = elapsed
+    return best
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    d = buildDashboard(n)
+    print("panels: %s" % n)
+    for name in serializer.encoders:
+        serializer.setEncoder(name)
+        encode = timeIt(lambda: serializer.dumpBytes(d.getDictionary()), 5)
+        body = serializer.dumpBytes(d.getDictionary())
+        decode = timeIt(lambda: serializer.loads(body), 5)
+        print("%-7s encode %8.2f ms   decode %8.2f ms" % (name, encode * 1000, decode * 1000))
+    serializer.setEncoder(serializer.encoders[0])
+    body = serializer.dumpBytes(d.getDictionary())
+    gzipTime = timeIt(lambda: serializer.requestBody(d.getDictionary(), compress=True), 5)
+    print("body:    %10d bytes" % len(body))
+    print("gzipped: %10d bytes (%.1f%%), %.2f ms including encode" % (len(gzip.compress(body, 5)),
+            100.0 * len(gzip.compress(body, 5)) / len(body), gzipTime * 1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+"""
+Benchmark for panel construction with and without the panel template cache.
+
+"before" clears the template cache ahead of every panel, which reproduces the old
+behaviour of opening and parsing the template json for each panel constructed.
+"after" uses the cache, so each template is parsed once and copied per panel.
+
+Usage: python benchmarks/bench_templates.py [number of panels]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import panel
+from panel import GraphPanel, SingleStatPanel, Query
+
+def buildPanels(n, cached):
+    """
+    Parameters: number of panels to build, and whether the template cache may be used
+    Returns: panels built per second
+    """
+    q = Query("nutmeg", "Incoming network traffic on eth0")
+    start = time.perf_counter()
+    for i in range(n):
+        if not cached:
+            panel._templates.clear()
+        if i % 2:
+            GraphPanel(title="graph %s" % i, queryArray=[q])
+        else:
+            SingleStatPanel(title="stat %s" % i, queryArray=[q])
+    elapsed = time.perf_counter() - start
+    return n / elapsed
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    before = buildPanels(n, cached=False)
+    after = buildPanels(n, cached=True)
+    print("panels: %s" % n)
+    print("before (read template per panel): %10.0f panels/s" % before)
+    print("after  (cached template copies):  %10.0f panels/s" % after)
+    print("speedup: %.2fx" % (after / before))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""
+Load test: pushes N generated dashboards to a grafana stub (or a real grafana, with --url and
+--token) using push_many, and reports throughput and push latency percentiles.
+
+Usage: python benchmarks/loadtest.py --dashboards 300 --panels 50 --workers 16 --latency 0.02
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+from dashboard import DashBoard
+from panel import GraphPanel, Query
+from publisher import push_many
+from stubserver import GrafanaStub
+
+def percentile(values, fraction):
+    """
+    Returns: the value at fraction (0 to 1) of the sorted values, nearest rank
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[rank]
+
+def buildDashboards(n, panels, token, url):
+    """
+    Returns: n dashboards with the given number of graph panels each
+    """
+    dashboards = []
+    for i in range(n):
+        d = DashBoard(title="load test %04d" % i, token=token, url=url, panelsPerRow=4)
+        d.addPanels([GraphPanel(title="CPU host%04d" % p, queryArray=[Query("host%04d" % p, "Processor load")])
+                for p in range(panels)])
+        dashboards.append(d)
+    return dashboards
+
+def main():
+    parser = argparse.ArgumentParser(description="Push generated dashboards and report throughput and latency.")
+    parser.add_argument("--dashboards", type=int, default=300)
+    parser.add_argument("--panels", type=int, default=50, help="panels per dashboard")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--compress", action="store_true", help="gzip request bodies")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub latency per request, in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of stub requests answered with 429")
+    parser.add_argument("--url", help="push to this grafana instead of a stub")
+    parser.add_argument("--token", default="stub-token")
+    args = parser.parse_args()
+
+    stub = None
+    url = args.url
+    if url==None:
+        stub = GrafanaStub(latency=args.latency, errorRate=args.error_rate, rateLimitRate=args.rate_limit_rate).start()
+        url = stub.url + "/api/dashboards/db"
+    try:
+        dashboards = buildDashboards(args.dashboards, args.panels, args.token, url)
+        start = time.perf_counter()
+        results = push_many(dashboards, max_workers=args.workers, compress=args.compress)
+        elapsed = time.perf_counter() - start
+    finally:
+        if stub!=None:
+            stub.stop()
+
+    latencies = [result.latency for result in results if result.latency!=None]
+    statuses = {}
+    for result in results:
+        statuses[result.status] = statuses.get(result.status, 0) + 1
+    print("dashboards: %s x %s panels, %s workers%s" % (args.dashboards, args.panels, args.workers,
+            ", gzip" if args.compress else ""))
+    print("elapsed:    %.2f s" % elapsed)
+    print("throughput: %.1f dashboards/s" % (len(results) / elapsed))
+    print("latency:    p50 %.1f ms, p99 %.1f ms, max %.1f ms" % (percentile(latencies, 0.5) * 1000,
+            percentile(latencies, 0.99) * 1000, max(latencies) * 1000))
+    print("statuses:   %s" % ", ".join("%s: %s" % (status, n) for status, n in sorted(statuses.items(), key=str)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+"""
+Benchmark suite for grafapy's hot paths.
+
+Every case is timed several times. The best and median times are written as json, so a run
+after an upgrade can be compared against an earlier one:
+
+    python benchmarks/suite.py --output before.json
+    ...upgrade...
+    python benchmarks/suite.py --output after.json --baseline before.json
+
+With --baseline, cases whose median time grew by more than --threshold (default 1.25x) are
+reported as regressions and the suite exits with status 1. Use --filter to run only cases
+whose name contains a string, and --quick for fewer repeats.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import serializer
+from dashboard import DashBoard
+from panel import GraphPanel, SingleStatPanel, MathStatPanel, Query
+from stubserver import GrafanaStub
+
+cases = []
+
+def case(name, ops=1):
+    """
+    Parameters: name of the benchmark case, and the number of operations one run performs
+    Description: registers the decorated setup function. It is called before every timed run and
+        returns the zero argument callable that is timed.
+    """
+    def register(setup):
+        cases.append((name, ops, setup))
+        return setup
+    return register
+
+def makePanels(n, kind="graph"):
+    """
+    Returns: n panels of the given kind ("graph", "singlestat" or "math"), one host each
+    """
+    panels = []
+    for i in range(n):
+        host = "host%05d" % i
+        if kind=="graph":
+            panels.append(GraphPanel(title="CPU " + host, queryArray=[Query(host, "Processor load")]))
+        elif kind=="singlestat":
+            panels.append(SingleStatPanel(title="Uptime " + host, queryArray=[Query(host, "System uptime")],
+                    colors=["red", "green"], thresholds="1", units="s"))
+        else:
+            queries = [Query(host, "System uptime", alias="uptime"), Query(host, "ICMP ping", alias="ping")]
+            panels.append(MathStatPanel(title="Status " + host, queryArray=queries, math="uptime*ping",
+                    colors=["red", "green"], thresholds="1", units="s", colorBackground=True))
+    return panels
+
+def makeDashboard(n):
+    """
+    Returns: a dashboard with n graph panels
+    """
+    d = DashBoard(title="benchmark %s" % n, panelsPerRow=4)
+    d.addPanels(makePanels(n))
+    return d
+
+for kind, label in (("graph", "GraphPanel"), ("singlestat", "SingleStatPanel"), ("math", "MathStatPanel")):
+    case("construct %s x1000" % label, ops=1000)(lambda kind=kind: lambda: makePanels(1000, kind))
+
+@case("with_host MathStatPanel x1000", ops=1000)
+def setupClone():
+    prototype = makePanels(1, "math")[0]
+    hosts = ["host%05d" % i for i in range(1000)]
+    return lambda: [prototype.with_host(host).getDictionary() for host in hosts]
+
+for n, label in ((10, "10"), (1000, "1k"), (10000, "10k")):
+    def setupAdd(n=n):
+        panels = makePanels(n)
+        d = DashBoard(title="add", panelsPerRow=4)
+        return lambda: d.addPanels(panels)
+    case("addPanels %s" % label, ops=n)(setupAdd)
+
+@case("removePanelsByHost 200 of 3k", ops=200)
+def setupRemove():
+    d = makeDashboard(3000)
+    hosts = ["host%05d" % i for i in range(0, 3000, 15)]
+    return lambda: d.removePanelsByHost(hosts)
+
+@case("import 5k panel export (lazy)")
+def setupImportLazy():
+    text = makeDashboard(5000).exportToJSON()
+    return lambda: DashBoard(JSON=text)
+
+@case("import 5k panel export (hydrated)")
+def setupImportHydrated():
+    text = makeDashboard(5000).exportToJSON()
+    return lambda: DashBoard(JSON=text, lazy=False).getPanels()
+
+@case("exportToJSON 5k panels")
+def setupExport():
+    d = makeDashboard(5000)
+    d.exportToJSON()
+    return d.exportToJSON
+
+_stub = {}
+
+def stubURL():
+    """
+    Returns: url of a local grafana stub that accepts dashboard posts, started on first use
+    """
+    if "server" not in _stub:
+        _stub["server"] = GrafanaStub().start()
+    return _stub["server"].url + "/api/dashboards/db"
+
+@case("push 1k panels to local stub")
+def setupPush():
+    d = makeDashboard(1000)
+    url = stubURL()
+    return lambda: d.push(postURL=url)
+
+def timeCase(setup, repeat):
+    """
+    Returns: list of repeat timings, in seconds, of the callable returned by setup
+    """
+    times = []
+    for i in range(repeat):
+        run = setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+def compare(results, baselinePath, threshold):
+    """
+    Returns: list of (name, baseline median, median) for every case slower than threshold times its
+        baseline
+    """
+    with open(baselinePath) as baselineFile:
+        baseline = json.load(baselineFile)["results"]
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name in baseline:
+            before = baseline[name]["median"]
+            ratio = result["median"] / before if before else 1.0
+            print("  %-36s %10.2f ms -> %10.2f ms  %5.2fx" % (name, before * 1000, result["median"] * 1000, ratio))
+            if ratio > threshold:
+                regressions.append((name, before, result["median"]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run grafapy's benchmark suite.")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "latest.json"))
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--filter", default="")
+    parser.add_argument("--quick", action="store_true", help="one warmup and three timed runs per case")
+    args = parser.parse_args()
+    repeat = 3 if args.quick else 7
+
+    results = {}
+    for name, ops, setup in cases:
+        if args.filter not in name:
+            continue
+        timeCase(setup, 1)
+        times = timeCase(setup, repeat)
+        results[name] = {"min": min(times), "median": statistics.median(times), "repeat": repeat,
+                         "ops": ops, "opsPerSecond": ops / statistics.median(times)}
+        print("%-36s best %10.2f ms  median %10.2f ms  %12.0f ops/s" % (name, min(times) * 1000,
+                statistics.median(times) * 1000, results[name]["opsPerSecond"]))
+
+    report = {"meta": {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "python": platform.python_version(), "platform": platform.platform(),
+                       "encoder": serializer.encoder},
+              "results": results}
+    directory = os.path.dirname(os.path.abspath(args.output))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(args.output, "w") as outFile:
+        json.dump(report, outFile, indent=2, sort_keys=True)
+    print("results written to %s" % args.output)
+
+    if args.baseline:
+        print("compared with %s:" % args.baseline)
+        regressions = compare(results, args.baseline, args.threshold)
+        for name, before, after in regressions:
+            print("REGRESSION %s: %.2f ms -> %.2f ms" % (name, before * 1000, after * 1000))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Examples for grafaPy API.
 """
 from dashboard import *
 from panel import *
+import logging
 import os
 import sys
 
@@ -166,11 +167,14 @@ def example4(token, URL):
         p = MathStatPanel(title=panelTitle, queryArray=[q1, q2], colors=colors, thresholds=threshold, units=units, decimals=decimals, math=math, colorBackground=True, absLink=absLink)
         panels.append(p)
 
-    #add panels to your dashboard, and push
-    d.addPanels(panels)
+    #add panels to your dashboard, and push. the panels only differ by host, so repeat=True sends a single
+    #panel that grafana repeats for every host of a generated $host variable, links included
+    d.addPanels(panels, repeat=True)
     d.push()
 
 def main():
+    #grafapy reports what it is doing through the logging module
+    logging.basicConfig(level=logging.INFO)
     grafAuth = os.environ["HOME"] + "/grafanaToken"
     token, URL = getCredentials(grafAuth)
     example1(token)
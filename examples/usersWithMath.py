@@ -4,6 +4,7 @@ Herbie Rand
 """
 from dashboard import *
 from panel import *
+from inventory import HostInventory
 from pyzabbix import ZabbixAPI
 import json   
 import requests
@@ -49,30 +50,18 @@ def getCredentials(zabAuth, grafAuth):
 
     return zabbixAPI, token, URL
 
-def getHosts(zabbixAPI, group):
-    """
-    Parameters: zabbixAPI object
-    Returns: a list of zabbix hosts from the provided group
-    """
-    zabbixGroup = zabbixAPI.hostgroup.get(output=["groupid"], filter={"name":[group]})
-    groupID = [zabbixGroup[0]["groupid"]]
-    myGroup = zabbixAPI.host.get(output=["host"], groupids=groupID)
-    hostNames = []
-    for host in myGroup:
-        hostNames.append(host["host"])
-    hostNames.sort()
-    return hostNames
-
 def main():
     zabAuth = os.environ["HOME"] + "/zabbixAuth"
     grafAuth = os.environ["HOME"] + "/grafanaToken"
     zabbixAPI, token, url = getCredentials(zabAuth, grafAuth)
-    hosts = getHosts(zabbixAPI, "Lab_240")
+    #host groups are expanded in one zabbix call, and cached for 10 minutes between runs
+    inventory = HostInventory(zabbixAPI, cachePath=os.environ["HOME"] + "/.grafapy/inventory.json", ttl=600)
     url += "/api/dashboards/db"
     d = DashBoard(title="Users Per Lab", token=token, url=url)
     groups = ["Lab_238", "Lab_240", "Lab_252", "Lab_256","Lab_Clothier"]
+    hostsByGroup = inventory.getHostsForGroups(groups)
     for group in groups:
-        hosts = getHosts(zabbixAPI, group)
+        hosts = hostsByGroup[group]
         queries = []
         queries2 = []
         math = ""
@@ -90,5 +79,7 @@ def main():
         myPanel = MathStatPanel(title=title, math=math[:-1], postfix=" user(s)", queryArray=queries)
         myPanel2 = MathStatPanel(title=title2, math=math2[:-1], postfix=postfix, queryArray=queries2)
         d.addPanels([myPanel, myPanel2])
+    #one regex target per panel instead of one target per host
+    d.coalesceQueries()
     d.push()
 main()
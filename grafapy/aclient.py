@@ -0,0 +1,78 @@
+"""
+asyncio client for grafana, used by DashBoard.apush and DashBoard.afrom_uid.
+
+One AsyncGrafanaClient holds a single aiohttp connection pool and a semaphore that bounds
+the number of requests in flight, so thousands of dashboard syncs can share one event loop:
+
+    async with AsyncGrafanaClient(limit=20) as client:
+        await asyncio.gather(*[d.apush(client=client) for d in dashboards])
+
+aiohttp is only needed when this module is used.
+"""
+
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class AsyncGrafanaClient:
+    def __init__(self, limit=10, timeout=30):
+        """
+        Parameters: limit, the maximum number of concurrent requests (and pooled connections),
+            and timeout, total seconds allowed per request.
+        """
+        if aiohttp==None:
+            raise Exception("AsyncGrafanaClient requires aiohttp. Install it with 'pip install aiohttp'.")
+        self.limit = limit
+        self.timeout = timeout
+        self.session = None
+        self.semaphore = None
+
+    async def _getSession(self):
+        """
+        Returns: this client's aiohttp session, created on first use inside the running event loop
+        """
+        if self.session==None:
+            connector = aiohttp.TCPConnector(limit=self.limit)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self.semaphore = asyncio.Semaphore(self.limit)
+        return self.session
+
+    async def request(self, method, url, headers=None, json=None, data=None):
+        """
+        Parameters: http method, url, optional headers, and either a json-compatible body or raw data
+        Returns: (status code, response text)
+        """
+        session = await self._getSession()
+        async with self.semaphore:
+            async with session.request(method, url, headers=headers, json=json, data=data) as response:
+                return response.status, await response.text()
+
+    async def get(self, url, headers=None):
+        """
+        Returns: (status code, response text) of a GET request
+        """
+        return await self.request("GET", url, headers=headers)
+
+    async def post(self, url, headers=None, json=None, data=None):
+        """
+        Returns: (status code, response text) of a POST request
+        """
+        return await self.request("POST", url, headers=headers, json=json, data=data)
+
+    async def close(self):
+        """
+        Description: closes the connection pool. Using the client again opens a new one.
+        """
+        if self.session!=None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, excType, exc, tb):
+        await self.close()
@@ -0,0 +1,161 @@
+"""
+Builds many dashboards from specs across a pool of processes.
+
+Building panels is pure python dictionary work, so one process only keeps one core busy. A spec
+is a plain dictionary that describes a dashboard, so it is cheap to send to a worker process:
+
+    {"title": "Users per lab", "uid": "users-per-lab", "panelsPerRow": 2, "panelHeight": 8,
+     "pack": False, "repeat": False, "coalesce": None, "queryOptions": {"interval": "5m"},
+     "panels": [{"type": "math", "title": "Users in Lab_238", "math": "a+b", "postfix": " user(s)",
+                 "queries": [{"host": "a", "item": "Number of logged in users", "alias": "a"},
+                             {"host": "b", "item": "Number of logged in users", "alias": "b"}]},
+                {"type": "graph", "title": "Load", "size": [8, 24],
+                 "queryTable": {"hosts": ["a", "b"], "items": ["Processor load"], "alias": "host"}}]}
+
+Panel types are "graph", "singlestat" and "math". Every other key of a panel spec, except
+queries, queryTable, size and queryOptions, is passed to the panel's constructor. Only title is
+required in a dashboard spec.
+
+Workers send back the dashboard json (or, when pushing, a PushResult without the dashboard),
+never panel objects. A dashboard is built the same way whichever process builds it, so the output does not
+depend on the number of workers.
+
+    texts = build_many(specs, max_workers=16)
+    results = build_many(specs, max_workers=16, push=True, postURL=url, token=token, state=state)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import serializer
+import instrument
+from dashboard import DashBoard
+from panel import GraphPanel, SingleStatPanel, MathStatPanel, Query, QueryTable
+from publisher import createSession, pushDashboard
+
+logger = instrument.getLogger("builder")
+
+panelTypes = {"graph": GraphPanel, "singlestat": SingleStatPanel, "math": MathStatPanel}
+
+_panelSpecKeys = ("type", "queries", "queryTable", "size", "queryOptions")
+
+def panelFromSpec(spec):
+    """
+    Parameters: a panel spec (see the module description)
+    Returns: the panel it describes
+    """
+    panelClass = panelTypes.get(spec.get("type"))
+    if panelClass==None:
+        raise Exception("Unknown panel type '%s' in panel '%s', use one of %s" % (spec.get("type"),
+                spec.get("title"), ", ".join(sorted(panelTypes))))
+    if "queryTable" in spec:
+        queries = QueryTable(**spec["queryTable"])
+    else:
+        queries = [Query(**query) for query in spec.get("queries", [])]
+    arguments = dict((key, value) for key, value in spec.items() if key not in _panelSpecKeys)
+    panel = panelClass(queryArray=queries, **arguments)
+    if "size" in spec:
+        panel.setSize(*spec["size"])
+    if "queryOptions" in spec:
+        panel.setQueryOptions(**spec["queryOptions"])
+    return panel
+
+def buildDashboard(spec, token=None, url=None, panelFactory=panelFromSpec):
+    """
+    Parameters: a dashboard spec (see the module description), the token and url to push with, and
+        the function that turns each panel spec into a panel
+    Returns: the DashBoard it describes
+    """
+    dashboard = DashBoard(title=spec["title"], token=token, url=url, panelsPerRow=spec.get("panelsPerRow", 2),
+                          panelHeight=spec.get("panelHeight", 8), pack=spec.get("pack", False))
+    if spec.get("uid")!=None:
+        #the uid is set afterwards, passing it to the constructor would fetch the dashboard
+        dashboard.uid = spec["uid"]
+        dashboard.dictionary["dashboard"]["uid"] = spec["uid"]
+    if spec.get("queryOptions"):
+        dashboard.setQueryOptions(**spec["queryOptions"])
+    dashboard.addPanels((panelFactory(panel) for panel in spec.get("panels", [])), repeat=spec.get("repeat", False))
+    if spec.get("coalesce"):
+        dashboard.coalesceQueries(spec["coalesce"])
+    return dashboard
+
+#set in each worker process by _initWorker: one session, so its pushes reuse connections, and the
+#hashes of the last pushes, sent once per worker rather than with every spec
+_session = None
+_hashes = None
+
+def _initWorker(hashes):
+    """
+    Parameters: dictionary of push state keys to the hash each was last pushed with, or None
+    Description: runs once in every worker process
+    """
+    global _hashes
+    _hashes = hashes
+
+def _build(job):
+    """
+    Parameters: (spec, push, postURL, token, compress), see build_many
+    Returns: the dashboard's json string, or, if pushing, a PushResult without the dashboard or
+        its response
+    Description: runs in a worker process
+    """
+    global _session
+    spec, push, postURL, token, compress = job
+    dashboard = buildDashboard(spec, token, postURL)
+    if not push:
+        return serializer.dumps(dashboard.getDictionary())
+    if _session==None:
+        _session = createSession(1)
+    unchanged = None
+    if _hashes!=None:
+        unchanged = lambda key, digest: _hashes.get(key)==digest
+    result = pushDashboard(dashboard, postURL, _session, compress, unchanged)
+    #only the summary goes back to the parent process
+    result.dashboard = None
+    result.response = None
+    if result.error!=None:
+        result.error = str(result.error)
+    return result
+
+def build_many(specs, max_workers=None, push=False, postURL=None, token=None, compress=False, state=None, chunksize=None):
+    """
+    Parameters: list of dashboard specs, the number of worker processes (os.cpu_count() by default,
+        1 builds in this process), push, set to True to push each dashboard from its worker, the
+        url and token to push with, compress, to gzip request bodies, an optional PushState to skip
+        dashboards unchanged since their last push, and the number of specs sent to a worker at once
+        (by default enough for each worker to get about four batches)
+    Returns: list, in the order of specs, of json strings, or of PushResults (see _build) if pushing
+    Description: a failed push is recorded in its result instead of being raised, but a spec that
+        cannot be built raises
+    """
+    specs = list(specs)
+    if push and postURL==None:
+        raise Exception("No postURL set! Set postURL=<url> to push built dashboards.")
+    if max_workers==None:
+        max_workers = os.cpu_count() or 1
+    if chunksize==None:
+        chunksize = max(1, len(specs) // (max_workers * 4))
+    hashes = dict(state.hashes) if state!=None else None
+    jobs = [(spec, push, postURL, token, compress) for spec in specs]
+    with instrument.timed("build"):
+        if max_workers<=1 or len(jobs)<=1:
+            _initWorker(hashes)
+            results = [_build(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_initWorker, initargs=(hashes,)) as executor:
+                results = list(executor.map(_build, jobs, chunksize=chunksize))
+    instrument.count("dashboards_built", len(results))
+    if push:
+        for result in results:
+            if result.skipped:
+                instrument.count("pushes_skipped")
+                if state!=None:
+                    state.markSkipped()
+            elif result.error!=None:
+                instrument.count("push_errors")
+                logger.warning("%s", result)
+            elif state!=None:
+                state.record(result.key, result.digest)
+        if state!=None:
+            state.save()
+    logger.info("Built %s dashboards with %s worker(s).", len(results), max_workers)
+    return results
@@ -0,0 +1,300 @@
+"""
+Compiles declarative dashboard specs (yaml or json files) into DashBoards, rebuilding only what
+changed since the last run.
+
+A spec file lists dashboards in the format of builder.py, plus host/item matrices:
+
+    groups:                          #optional, other groups are expanded with a HostInventory
+      Lab_238: [abra, charmander, meowth]
+    defaults:                        #optional, merged into every dashboard
+      panelsPerRow: 3
+    dashboards:
+      - title: Users Per Lab
+        uid: users-per-lab
+        panels:
+          - type: math
+            forEach: {group: [Lab_238, Lab_240]}
+            title: "Users in {group}"
+            hosts: {group: "{group}"}
+            items: [Number of logged in users]
+            alias: host
+            math: sum
+            postfix: " user(s)"
+          - type: graph
+            forEach: {host: {group: Lab_238}}
+            title: "{host} load"
+            queries: [{host: "{host}", item: Processor load}]
+
+forEach repeats a panel for every value of one variable, replacing "{<variable>}" in all of its
+strings. Its values, and hosts, are a list or {group: <name>}. hosts and items build a QueryTable
+(alias: host or item names the queries). math: sum adds up the aliases of all of the panel's
+queries.
+
+Every compiled panel is cached under a hash of its expanded spec, so a panel whose spec and hosts
+did not change is copied instead of built. Each dashboard is hashed from its own settings and its
+panels' hashes: compile(changedOnly=True) and push return only the dashboards whose hash changed
+since they were last pushed. With a cache directory, both caches are kept between runs.
+
+pyyaml is only needed for yaml files.
+"""
+
+import hashlib
+import os
+import threading
+import serializer
+import instrument
+import builder
+from panel import Query, _copyTemplate
+from publisher import push_many
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+logger = instrument.getLogger("compiler")
+
+#changes whenever compiled panels would come out differently for the same spec
+formatVersion = 1
+
+def load(path):
+    """
+    Parameters: path of a yaml (.yaml or .yml) or json spec file
+    Returns: the parsed spec document
+    """
+    with open(os.path.expanduser(path)) as specFile:
+        text = specFile.read()
+    if path.endswith(".yaml") or path.endswith(".yml"):
+        if yaml==None:
+            raise Exception("pyyaml is needed to read yaml specs, install it or use a json spec.")
+        return yaml.safe_load(text)
+    return serializer.loads(text)
+
+def _specHash(value):
+    """
+    Returns: sha256 hex digest of a spec, independent of its key order
+    """
+    return hashlib.sha256(serializer.dumpBytes([formatVersion, value], sortKeys=True)).hexdigest()
+
+def _substitute(value, name, replacement):
+    """
+    Returns: a copy of value with "{name}" replaced in every string
+    """
+    if isinstance(value, dict):
+        return {key: _substitute(v, name, replacement) for key, v in value.items()}
+    if isinstance(value, list):
+        return [_substitute(v, name, replacement) for v in value]
+    if isinstance(value, str):
+        return value.replace("{%s}" % name, replacement)
+    return value
+
+class Compiler:
+    def __init__(self, inventory=None, cacheDirectory=None):
+        """
+        Parameters: an optional HostInventory to expand host groups that a spec does not list, and an
+            optional directory to keep compiled panels and dashboard hashes in between runs
+        """
+        self.inventory = inventory
+        self.directory = None
+        if cacheDirectory!=None:
+            self.directory = os.path.expanduser(cacheDirectory)
+            if not os.path.isdir(os.path.join(self.directory, "panels")):
+                os.makedirs(os.path.join(self.directory, "panels"))
+        self.panels = {}
+        self.built = {}
+        self.pushed = self._loadIndex()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _loadIndex(self):
+        """
+        Returns: dictionary of dashboard keys to the hash they were last pushed with
+        """
+        if self.directory==None or not os.path.exists(os.path.join(self.directory, "dashboards.json")):
+            return {}
+        with open(os.path.join(self.directory, "dashboards.json")) as indexFile:
+            return serializer.loads(indexFile.read())
+
+    def _saveIndex(self):
+        """
+        Description: private method that writes the dashboard hashes, if there is a cache directory
+        """
+        if self.directory==None:
+            return
+        path = os.path.join(self.directory, "dashboards.json")
+        with open(path + ".tmp", "w") as indexFile:
+            indexFile.write(serializer.dumps(self.pushed))
+        os.replace(path + ".tmp", path)
+
+    def expand(self, document):
+        """
+        Parameters: a spec document (see the module description)
+        Returns: list of builder dashboard specs, with every forEach, group and matrix expanded
+        """
+        groups = dict(document.get("groups") or {})
+        defaults = document.get("defaults") or {}
+        specs = []
+        for dashboard in document.get("dashboards", []):
+            spec = dict(defaults)
+            spec.update(dashboard)
+            panels = []
+            for panel in spec.get("panels", []):
+                panels.extend(self._expandPanel(panel, groups))
+            spec["panels"] = panels
+            specs.append(spec)
+        return specs
+
+    def _hosts(self, value, groups):
+        """
+        Returns: list of host names for a list, or for {group: <name>}
+        """
+        if isinstance(value, dict):
+            name = value["group"]
+            if name not in groups:
+                if self.inventory==None:
+                    raise Exception("Host group '%s' is not in the spec's groups and no inventory was given." % name)
+                groups[name] = self.inventory.getHosts(name)
+            return list(groups[name])
+        return list(value)
+
+    def _expandPanel(self, panel, groups):
+        """
+        Returns: list of builder panel specs for one panel of a spec document
+        """
+        if "forEach" in panel:
+            ((name, values),) = panel["forEach"].items()
+            template = dict((key, value) for key, value in panel.items() if key!="forEach")
+            expanded = []
+            for value in self._hosts(values, groups):
+                expanded.extend(self._expandPanel(_substitute(template, name, value), groups))
+            return expanded
+        spec = dict(panel)
+        if "hosts" in spec or "items" in spec:
+            spec["queryTable"] = {"hosts": self._hosts(spec.pop("hosts", []), groups), "items": spec.pop("items", [])}
+            for key in ("alias", "group", "application", "mode"):
+                if key in spec:
+                    spec["queryTable"][key] = spec.pop(key)
+        if spec.get("math")=="sum":
+            spec["math"] = "+".join(_aliases(spec))
+        return [spec]
+
+    def _panel(self, spec):
+        """
+        Returns: the panel for a builder panel spec, copied from the cache if it was compiled before
+        """
+        key = _specHash(spec)
+        entry = self._cached(key)
+        if entry==None:
+            panel = builder.panelFromSpec(spec)
+            entry = {"class": spec["type"], "type": panel.getType(), "dictionary": _copyTemplate(panel.getDictionary()),
+                     "queries": [list(query._fields()) for query in panel.getQueries()],
+                     "queryOptions": panel.queryOptions, "size": panel.getSize() if panel._sizeSet() else None}
+            self._store(key, entry)
+            return panel
+        panel = builder.panelTypes[entry["class"]](JSON=_copyTemplate(entry["dictionary"]))
+        panel.type = entry["type"]
+        panel.queries = [Query(*fields) for fields in entry["queries"]]
+        panel.queryOptions = dict(entry["queryOptions"])
+        if entry["size"]!=None:
+            panel.setSize(*entry["size"])
+        return panel
+
+    def _cached(self, key):
+        """
+        Returns: the cache entry of a compiled panel, from memory or disk, or None
+        """
+        entry = self.panels.get(key)
+        if entry==None and self.directory!=None:
+            path = os.path.join(self.directory, "panels", key + ".json")
+            if os.path.exists(path):
+                with open(path) as panelFile:
+                    entry = serializer.loads(panelFile.read())
+                self.panels[key] = entry
+        with self.lock:
+            if entry==None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def _store(self, key, entry):
+        """
+        Description: private method that caches a compiled panel in memory and, if there is a cache
+            directory, on disk
+        """
+        self.panels[key] = entry
+        if self.directory!=None:
+            path = os.path.join(self.directory, "panels", key + ".json")
+            with open(path + ".tmp", "w") as panelFile:
+                panelFile.write(serializer.dumps(entry))
+            os.replace(path + ".tmp", path)
+
+    def dashboardHash(self, spec):
+        """
+        Parameters: a builder dashboard spec
+        Returns: hash of the dashboard's settings and of each of its panels' specs
+        """
+        settings = dict((key, value) for key, value in spec.items() if key!="panels")
+        return _specHash([settings, [_specHash(panel) for panel in spec.get("panels", [])]])
+
+    def compile(self, document, token=None, url=None, changedOnly=False):
+        """
+        Parameters: a spec document (or the path of a spec file), the token and url to push with,
+            and changedOnly, set to True to leave out dashboards unchanged since they were last pushed
+        Returns: list of DashBoards
+        """
+        if isinstance(document, str):
+            document = load(document)
+        dashboards = []
+        for spec in self.expand(document):
+            digest = self.dashboardHash(spec)
+            key = spec.get("uid") or spec["title"]
+            if changedOnly and self.pushed.get(key)==digest:
+                continue
+            with instrument.timed("compile"):
+                dashboard = builder.buildDashboard(spec, token, url, panelFactory=self._panel)
+            self.built[dashboard] = (key, digest)
+            dashboards.append(dashboard)
+        instrument.count("dashboards_compiled", len(dashboards))
+        logger.info("Compiled %s dashboard(s), %s", len(dashboards), self.summary())
+        return dashboards
+
+    def markPushed(self, dashboard):
+        """
+        Parameters: a dashboard returned by compile, after it was pushed
+        Description: records its hash, so compile(changedOnly=True) leaves it out until it changes
+        """
+        key, digest = self.built[dashboard]
+        self.pushed[key] = digest
+        self._saveIndex()
+
+    def push(self, document, token, url, max_workers=8, compress=False):
+        """
+        Parameters: a spec document (or path), the token and url to push with, the number of
+            concurrent pushes, and compress, to gzip request bodies
+        Returns: list of PushResults for the dashboards that changed since they were last pushed
+        """
+        dashboards = self.compile(document, token, url, changedOnly=True)
+        results = push_many(dashboards, max_workers=max_workers, compress=compress)
+        for result in results:
+            if result.succeeded():
+                self.markPushed(result.dashboard)
+        return results
+
+    def summary(self):
+        """
+        Returns: string with the number of panels copied from the cache and built
+        """
+        return "%s panel(s) from cache, %s built" % (self.hits, self.misses)
+
+def _aliases(spec):
+    """
+    Returns: the aliases of a builder panel spec's queries, as its targets will be named
+    """
+    if "queryTable" in spec:
+        table = spec["queryTable"]
+        if table.get("alias") not in ("host", "item"):
+            raise Exception("math: sum needs alias: host or alias: item on panel '%s'" % spec.get("title"))
+        return [host if table["alias"]=="host" else item for host in table["hosts"] for item in table["items"]]
+    return [query.get("alias") or query["item"] for query in spec.get("queries", [])]
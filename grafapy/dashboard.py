@@ -5,15 +5,78 @@ Herbie Rand
 This is a class for a grafana Dasbhoard, created as part of our custom grafana API.
 """
 
-import json
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from panel import Panel, GraphPanel, Query
+import serializer
+import instrument
+from panel import Panel, GraphPanel, SingleStatPanel, RepeatedPanel, Query, _copyTemplate
+from aclient import AsyncGrafanaClient
+from publisher import createSession
+from layout import GridLayout, gridColumns
+import sharding
+import planner
+import tuning
+import estimate
+import repeat as repeats
+
+logger = instrument.getLogger("dashboard")
+
+#placeholder for the panel list when a dashboard is streamed (see DashBoard.startStream)
+_streamMarker = "__grafapy_stream_panels__"
+
+#dashboard fields that grafana bumps on every save, ignored by DashBoard.contentHash
+_volatileFields = ("id", "version", "iteration")
+
+def _authHeaders(token):
+    """
+    Returns: headers for authenticated json requests to grafana
+    """
+    return {"Accept": "application/json",
+            "Content-Type": "application/json",
+            "Authorization": "Bearer %s" % token}
+
+def _currentVersion(session, urlPlusUID, headers):
+    """
+    Returns: the latest version number grafana reports for a dashboard, or None if it could not be
+        determined (in which case the caller should download the dashboard)
+    """
+    response = session.get(urlPlusUID + "/versions", headers=headers, params={"limit": 1})
+    if response.status_code!=200:
+        return None
+    versions = serializer.loads(response.content)
+    if isinstance(versions, dict):
+        #newer grafana versions wrap the list: {"continueToken": ..., "versions": [...]}
+        versions = versions.get("versions", [])
+    if not versions:
+        return None
+    return versions[0].get("version")
+
+def _panelFromDictionary(dictionary):
+    """
+    Returns: a panel object wrapping dictionary (not copied)
+    """
+    #for now, only initializing graph and singlestat type panels
+    if dictionary["type"]=="graph":
+        return GraphPanel(JSON=dictionary)
+    return SingleStatPanel(JSON=dictionary)
+
+def _copyPanel(panel):
+    """
+    Returns: a copy of panel, with its own dictionary, that keeps its size but not its position
+    """
+    copy = _panelFromDictionary(_copyTemplate(panel.getDictionary()))
+    if panel._sizeSet():
+        copy.setSize(*panel.getSize())
+    copy.queryOptions = dict(panel.queryOptions)
+    return copy
 
 class DashBoard:
     #add panels per row option
-    def __init__(self, title="title", uid=None, token=None, url=None, JSON=None, panelsPerRow=2, panelHeight=8):
+    def __init__(self, title="title", uid=None, token=None, url=None, JSON=None, panelsPerRow=2, panelHeight=8, lazy=True, pack=False):
         """
-        Parameters: title, uid, authentication token, url, JSON, panelsPerRow, and panelHeight.
+        Parameters: title, uid, authentication token, url, JSON, panelsPerRow, panelHeight, lazy, and pack.
             If a uid is set, a dashboard will be initialized using provided token and url by
             retrieving an existing dashboard. uid, token, and url must all be set to do this!
             If no uid is set, a new dashboard will be created with the optionally set title and
@@ -27,22 +90,31 @@ class DashBoard:
             url:
                 This should be the url of the dasbhoard you wish to modify. NOTE: do not include uid in this url, only everything up to the uid of the dashboard you wish to modify.
             JSON:
-                Use this option to load in a dashboard from a JSON file. NOTE: Not all types of panels are supported in this API, so panel objects may not be initialized correctly. 
+                Use this option to load in a dashboard from a JSON string (or an already parsed dictionary). NOTE: Not all types of panels are supported in this API, so panel objects may not be initialized correctly. 
             panelsPerRow:
                 Sets the number of panels you want to see per row in your dashboard. Ensures all supported panels are of uniform length.
             panelHeight:
                 Sets the height of each panel in your dashboard. Ensures all supported panels are of uniform height.
+            lazy:
+                When loading an existing dashboard, panel objects are only built the first time they are needed (True by default). Loading a dashboard just to rename or push it then never builds them. Set to False to build them immediately.
+            pack:
+                Set to True to pack panels of mixed sizes (see Panel.setSize) into the lowest free spot instead of placing them one row at a time.
 
         """
         self.title = title
         self.uid = uid
-        self.headers = {"Accept": "application/json",
-                        "Content-Type": "application/json",
-                        "Authorization": "Bearer %s" % token}
+        self.headers = _authHeaders(token)
         self.URL = url
         self.panels = []
+        self._index = None
+        self._stream = None
+        self.lazy = lazy
+        self.queryOptions = {}
+        self.budget = None
+        self.history = None
         self.panelsPerRow = panelsPerRow
         self.panelHeight = panelHeight
+        self.layout = GridLayout(panelsPerRow, panelHeight, pack)
 
         if (self.uid!=None):
             self._initWithUID()
@@ -60,32 +132,107 @@ class DashBoard:
             raise Exception("You must set url to initialize DashBoard with UID.")
 
         urlPlusUID = self.URL + self.uid 
-        dashObj = requests.get(urlPlusUID, headers=self.headers)
+        with instrument.timed("fetch"):
+            dashObj = requests.get(urlPlusUID, headers=self.headers)
+        instrument.count("fetches")
 
         if dashObj.status_code!=200:
             raise Exception("Dashboard not found. \nStatus code %s \nURL: %s " % (dashObj.status_code,urlPlusUID))
         self._importJSON(dashObj.text)
     
+    @classmethod
+    def from_uids(cls, uids, token, url, cache=None, max_workers=8, session=None, panelsPerRow=2, panelHeight=8):
+        """
+        Parameters: list of uids, token and url as in the constructor, an optional DashboardCache,
+            number of concurrent workers, an optional requests.Session, and optional panelsPerRow
+            and panelHeight applied to every dashboard
+        Returns: list of DashBoards in the same order as uids
+        Description: loads many existing dashboards concurrently over one pooled session. With a
+            cache, only the dashboard's current version is requested first, and the full json is
+            downloaded only if that version is not already cached.
+        """
+        if url==None:
+            raise Exception("You must set url to initialize DashBoard with UID.")
+        uids = list(uids)
+        headers = _authHeaders(token)
+        ownSession = session==None
+        if ownSession:
+            session = createSession(max_workers)
+
+        def fetchOne(uid):
+            urlPlusUID = url + uid
+            if cache!=None:
+                version = _currentVersion(session, urlPlusUID, headers)
+                data = cache.get(uid, version)
+                if data!=None:
+                    return uid, data, None
+            with instrument.timed("fetch"):
+                dashObj = session.get(urlPlusUID, headers=headers)
+            instrument.count("fetches")
+            if dashObj.status_code!=200:
+                return uid, None, dashObj.status_code
+            dictionary = serializer.loads(dashObj.content)
+            if cache!=None and dictionary["dashboard"].get("version")!=None:
+                cache.put(uid, dictionary["dashboard"]["version"], dashObj.content)
+            return uid, dictionary, None
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                fetched = list(executor.map(fetchOne, uids))
+        finally:
+            if ownSession:
+                session.close()
+
+        failed = ["%s (status %s)" % (uid, status) for uid, data, status in fetched if data==None]
+        if failed:
+            raise Exception("Dashboards not found at %s: %s" % (url, ", ".join(failed)))
+        dashboards = []
+        for uid, data, status in fetched:
+            dashboard = cls(token=token, url=url, JSON=data, panelsPerRow=panelsPerRow, panelHeight=panelHeight)
+            dashboard.uid = uid
+            dashboards.append(dashboard)
+        return dashboards
+
     def _importJSON(self, dashObj):
         """
-        Parameters: json string of a grafana dashboard
+        Parameters: json string (or parsed dictionary) of a grafana dashboard
         Description: private method to be called when importing json or initializing dashboard from uid
         """
-        self.dictionary = json.loads(dashObj)
+        if isinstance(dashObj, dict):
+            self.dictionary = dashObj
+        else:
+            self.dictionary = serializer.loads(dashObj)
         self.title = self.dictionary["dashboard"]["title"]
-        for panel in self.dictionary["dashboard"]["panels"]:
-            #for now, only initializing graph and singlestat type panels
-            if panel["type"]=="graph":
-                pan = GraphPanel(JSON=json.dumps(panel))
-            else:
-                pan = SingleStatPanel(JSON=json.dumps(panel))
-            self.panels.append(pan)
+        self.panels = None
+        self._index = None
+        if not self.lazy:
+            self._hydratePanels()
+
+    def _hydratePanels(self):
+        """
+        Description: private method that builds panel objects directly from the panel dictionaries of
+            an imported dashboard. Each panel shares its dictionary with self.dictionary.
+        """
+        self._panels = [_panelFromDictionary(panel) for panel in self.dictionary["dashboard"]["panels"]]
+
+    @property
+    def panels(self):
+        """
+        Returns: list of this dashboard's panel objects, built on first access for imported dashboards
+        """
+        if self._panels==None:
+            self._hydratePanels()
+        return self._panels
+
+    @panels.setter
+    def panels(self, panelList):
+        self._panels = panelList
     
     def _createNewDashBoard(self):
         """
         Description: private method to be called by constructor to create a new dashboard dictionary
         """
-        print("Creating new dashboard '%s'" % self.title)
+        logger.info("Creating new dashboard '%s'", self.title)
         dashContents = {"id": None,
                         "title": self.title,
                         "tags": [],
@@ -97,36 +244,95 @@ class DashBoard:
         self.dictionary = {"dashboard":dashContents, "folderID":0, "overwrite":False}
         self.uid = "unknown"
 
-    def addPanels(self, panelArray):
+    def addPanels(self, panelArray, repeat=False, variable="host"):
         """
-        Parameters: a list of panels
-        Description: adds and sorts panel objects to this dashboard. Supported panels: Graph Panels, SingleStat Panels. Using addPanels sorts panels by assigning them ids from 0 to (number of panels - 1), and adds panels in in uniform size one row at a time, left to right.
+        Parameters: a list (or any iterable, such as a generator) of panels, and repeat, set to True to
+            send panels that differ only by host as one panel repeated by grafana over a host
+            template variable named variable (see repeat.py)
+        Description: adds and sorts panel objects to this dashboard. Supported panels: Graph Panels, SingleStat Panels. Using addPanels sorts panels by assigning them ids from 0 to (number of panels - 1), and adds panels in in uniform size one row at a time, left to right. Panels already in the dashboard are not moved.
+            While a stream is open (see startStream), panels are written to the stream as they arrive instead of being kept in the dashboard.
         """
-        if len(self.panels)!=0:
-            for panel in self.panels:
-                if panel.getID()>=len(self.panels):
-                    self.panels = self._sortPanels(self.panels, 0)
-        panelArray = self._sortPanels(panelArray, len(self.panels))
+        if repeat:
+            panelArray = repeats.findRepeats(list(panelArray), variable, variables=self._hostVariables())
+        if self._stream!=None:
+            self._streamPanels(panelArray)
+            return
+        startID = len(self.panels)
         self.panels.extend(panelArray)
-        for panel in panelArray:
-            self.dictionary["dashboard"]["panels"].append(panel.getDictionary())
-    
-    def _sortPanels(self, panelArray, startID):
+        with instrument.timed("layout"):
+            if len(self.layout.states)!=startID:
+                #panels imported from json keep their positions, new panels go below them
+                self.layout.seed(self.panels[:startID])
+            for i in range(startID, len(self.panels)):
+                panel = self.panels[i]
+                if isinstance(panel, RepeatedPanel):
+                    self._addRepeat(panel)
+                self.layout.place(panel, i)
+                tuning.tune(panel, self.queryOptions)
+                self.dictionary["dashboard"]["panels"].append(panel.dictionary)
+                if self._index!=None:
+                    self._indexPanel(panel, self._index)
+        instrument.count("panels_added", len(self.panels) - startID)
+
+    def _hostVariables(self):
         """
-        Parameters: array of panels to be properly ID'd and positioned
-        Returns: Updated array
+        Returns: dictionary of the names of this dashboard's template variables to their values
         """
-        for i in range(len(panelArray)):
-            panelArray[i].setID(i+startID)
-            panelArray[i]._setSize(self.panelHeight, 24/self.panelsPerRow)
-            if (i+startID)-self.panelsPerRow<0:
-                x = (i+startID)*(24/self.panelsPerRow)
-                y = 0
-            else:
-                x = ((i+startID)%(self.panelsPerRow))*(24/self.panelsPerRow)
-                y = (i+startID)/self.panelsPerRow * self.panelHeight
-            panelArray[i]._setPosition(x, y)
-        return panelArray
+        variables = {}
+        for entry in self.dictionary["dashboard"].get("templating", {}).get("list", []):
+            values = [option["value"] for option in entry.get("options", []) if option.get("value")!="$__all"]
+            variables[entry["name"]] = tuple(values)
+        return variables
+
+    def _addRepeat(self, panel):
+        """
+        Description: private method that adds a repeated panel's host variable to the dashboard, and
+            repeats it panelsPerRow to a row unless it sets its own maxPerRow. The panel itself
+            spans a whole row, grafana sizes its copies.
+        """
+        panel.dictionary.setdefault("maxPerRow", self.panelsPerRow)
+        if not panel._sizeSet():
+            panel.setSize(self.panelHeight, gridColumns)
+        variables = self.dictionary["dashboard"].setdefault("templating", {"list": []})["list"]
+        entry = panel.templateVariable()
+        for i in range(len(variables)):
+            if variables[i]["name"]==entry["name"]:
+                if variables[i]!=entry:
+                    logger.warning("Template variable '%s' on '%s' replaced by the hosts of panel '%s'.",
+                            entry["name"], self.title, panel.getTitle())
+                variables[i] = entry
+                return
+        variables.append(entry)
+
+    def setQueryOptions(self, **options):
+        """
+        Parameters: any of maxDataPoints, interval, cacheTimeout, and pointsPerColumn (the number of
+            points a graph requests per grid column of its width, 4 by default, see tuning.py)
+        Description: replaces the width and type based query options (see tuning.py) for every panel
+            added from now on, except where a panel sets its own. Call tuneQueries to apply them to
+            the panels already in the dashboard.
+        """
+        for name in options:
+            if name not in tuning.queryOptionNames + ("pointsPerColumn",):
+                raise Exception("Unknown query option '%s'" % (name))
+        self.queryOptions.update(options)
+
+    def tuneQueries(self):
+        """
+        Description: sets the query options of every graph and singlestat panel from its type and
+            width, including panels imported from json (see setQueryOptions and tuning.py)
+        """
+        for panel in self.panels:
+            tuning.tune(panel, self.queryOptions)
+
+    def getDictionary(self):
+        """
+        Returns: this dashboard's dictionary (python, not json), with the targets of every panel built
+        """
+        if self._panels!=None:
+            for panel in self._panels:
+                panel._buildTargets()
+        return self.dictionary
 
     def getPanels(self):
         """
@@ -139,94 +345,166 @@ class DashBoard:
         Parameters: list of host names to be checked with this dashboard's panels. Panels with the host
             will be removed from the dashboard. 
         """
-        sort = False
-        for host in hostNameArray:
-            changed = self._removePanelBy("host", host)
-            if changed:
-                sort = True
-        if sort:
-            self._sortPanels(self.panels, 0)
-        else:
-            print("No panels with those hosts found in your dashboard!")
+        if self.removePanels(hosts=hostNameArray)==0:
+            logger.info("No panels with those hosts found in your dashboard!")
     
     def removePanelsByItem(self, itemNameArray):
         """
         Parameters: list of item names to be checked with this dashboard's panels. Panels with the item
             will be removed from the dashboard.
         """
-        sort = False
-        for item in itemNameArray:
-            changed = self._removePanelBy("item", item)
-            if changed:
-                sort = True
-        if sort:
-            self._sortPanels(self.panels, 0)
-        else:
-            print("No panels with those items found in your dashboard!")
+        if self.removePanels(items=itemNameArray)==0:
+            logger.info("No panels with those items found in your dashboard!")
     
     def removePanelsByTitle(self, titleArray):
         """
         Parameters: list of title names to be checked with this dashboard's panels. Panels with matching title
             will be removed from the dashboard.
         """
-        sort = False
-        for title in titleArray:
-            changed = self._removePanelBy("title", title)
-            if changed:
-                sort = True
-        if sort:
-            self._sortPanels(self.panels, 0)
-        else:
-            print("No panels with those titles found in your dashboard!")
-    
-    def _removePanelBy(self, key, value):
+        if self.removePanels(titles=titleArray)==0:
+            logger.info("No panels with those titles found in your dashboard!")
+
+    def removePanels(self, hosts=None, items=None, titles=None):
         """
-        Parameters: key and value of what should be removed from the dashboard dictionary
-        Returns: bool indicating whether a change was made to the dictionary
-        Description: private method called by 'removePanelsBy...' methods
+        Parameters: optional lists of host names, item names and titles. A panel matching any of them
+            is removed from the dashboard.
+        Returns: number of panels removed, counting every host removed from a repeated panel
+        Description: looks the panels up in this dashboard's index, removes them all in a single pass
+            over the panel list, and then re-sorts only the panels after the first one removed.
+            A repeated panel (see RepeatedPanel) matching a host only loses that host, from the
+            panel and its template variable, and is removed once it has no hosts left.
         """
-        toRemove = []
-        found = False
-        changed = False
-        for panel in self.panels:
-            if key!="title":
-                if key=="host":
-                    if panel.containsHost(value):
-                        toRemove.append(panel)
-                        changed = True
-                        found = True
-                    else:
-                        found = False
-                elif key=="item":
-                    if panel.containsItem(value):
-                        toRemove.append(panel)
-                        changed = True
-                        found = True
-                    else:
-                        found = False
-                else:
-                    print("Unrecognized key '%s'" % (key))
-                    raise Exception("You broke the API!")
-                if found:
-                    for panel in self.dictionary["dashboard"]["panels"]:
-                        for target in panel["targets"]:
-                            if target[key]["filter"]==value:
-                                print(panel["title"] + " removed from dashboard.")
-                                self.dictionary["dashboard"]["panels"].remove(panel)
-                                changed = True
-                                found = False
+        index = self._getIndex()
+        toRemove = set()
+        repeatHosts = {}
+        for key, values in (("host", hosts), ("item", items), ("title", titles)):
+            if values!=None:
+                for value in values:
+                    for panel in index[key].get(value, ()):
+                        if key=="host" and isinstance(panel, RepeatedPanel):
+                            repeatHosts.setdefault(panel, set()).add(value)
+                        else:
+                            toRemove.add(panel)
+        removedHosts = 0
+        for panel, removed in repeatHosts.items():
+            if panel in toRemove:
+                continue
+            remainingHosts = [host for host in panel.hosts if host not in removed]
+            if not remainingHosts:
+                toRemove.add(panel)
+                continue
+            removedHosts += len(panel.hosts) - len(remainingHosts)
+            self._unindexPanel(panel, index)
+            panel.hosts = remainingHosts
+            self._indexPanel(panel, index)
+            self._setVariable(panel.templateVariable())
+            logger.debug("Removed %s host(s) from repeated panel %s.", len(removed), panel.getTitle())
+        if not toRemove:
+            return removedHosts
+        remaining = []
+        firstRemoved = None
+        for i, panel in enumerate(self.panels):
+            if panel in toRemove:
+                if firstRemoved==None:
+                    firstRemoved = i
+                logger.debug("%s removed from dashboard.", panel.getTitle())
+                self._unindexPanel(panel, index)
             else:
-                if panel.getTitle()==value:
-                    toRemove.append(panel)
-                    changed = True
-                    for panel in self.dictionary["dashboard"]["panels"]:
-                        if panel["title"]==value:
-                            print(value + "removed from dashbaord.")
-                            self.dictionary["dashboard"]["panels"].remove(panel)
-                            changed = True 
+                remaining.append(panel)
+        removedDicts = set(id(panel.dictionary) for panel in toRemove)
+        dashPanels = self.dictionary["dashboard"]["panels"]
+        dashPanels[:] = [panel for panel in dashPanels if id(panel) not in removedDicts]
+        self.panels = remaining
+        used = set(panel.variable for panel in remaining if isinstance(panel, RepeatedPanel))
         for panel in toRemove:
-            self.panels.remove(panel)
-        return changed 
+            if isinstance(panel, RepeatedPanel) and panel.variable not in used:
+                self._removeVariable(panel.variable)
+        with instrument.timed("layout"):
+            self.layout.relayout(self.panels, firstRemoved)
+        instrument.count("panels_removed", len(toRemove))
+        return len(toRemove) + removedHosts
+
+    def _setVariable(self, entry):
+        """
+        Description: private method that replaces the template variable named like entry with entry
+        """
+        variables = self.dictionary["dashboard"].get("templating", {}).get("list", [])
+        for i in range(len(variables)):
+            if variables[i]["name"]==entry["name"]:
+                variables[i] = entry
+
+    def _removeVariable(self, name):
+        """
+        Description: private method that removes the template variable called name, if there is one
+        """
+        templating = self.dictionary["dashboard"].get("templating")
+        if templating!=None:
+            templating["list"] = [entry for entry in templating.get("list", []) if entry["name"]!=name]
+
+    def findPanels(self, host=None, item=None, title=None):
+        """
+        Parameters: optional host name, item name and title
+        Returns: list of this dashboard's panels matching all of the given arguments, in dashboard order
+        """
+        index = self._getIndex()
+        matches = None
+        for key, value in (("host", host), ("item", item), ("title", title)):
+            if value!=None:
+                found = index[key].get(value, set())
+                matches = set(found) if matches==None else matches & found
+        if matches==None:
+            return list(self.panels)
+        return [panel for panel in self.panels if panel in matches]
+
+    def _getIndex(self):
+        """
+        Returns: this dashboard's index of panels by host, item and title, built on first use.
+            Panels whose queries changed since they were indexed (see Panel.addQueries) are
+            indexed again.
+        """
+        if self._index==None:
+            index = {"host": {}, "item": {}, "title": {}, "panels": {}, "changed": set()}
+            for panel in self.panels:
+                self._indexPanel(panel, index)
+            self._index = index
+        elif self._index["changed"]:
+            index = self._index
+            for panel in list(index["changed"]):
+                if panel in index["panels"]:
+                    self._unindexPanel(panel, index)
+                    self._indexPanel(panel, index)
+            index["changed"].clear()
+        return self._index
+
+    def _indexPanel(self, panel, index):
+        """
+        Description: private method that adds panel to index under its title, hosts and items, and
+            has the panel report changes to its queries to the index
+        """
+        keys = [("title", panel.getTitle())]
+        for query in panel.getQueries():
+            keys.append(("host", query.getHost()))
+            keys.append(("item", query.getItem()))
+        if isinstance(panel, RepeatedPanel):
+            #a repeated panel's queries use its variable, it is indexed under the hosts it is drawn for
+            keys.extend(("host", host) for host in panel.hosts)
+        for key, value in keys:
+            index[key].setdefault(value, set()).add(panel)
+        index["panels"][panel] = keys
+        panel._watchers[id(index["changed"])] = index["changed"]
+
+    def _unindexPanel(self, panel, index):
+        """
+        Description: private method that removes panel from index, under the keys it was indexed with
+        """
+        keys = index["panels"].pop(panel)
+        for key, value in keys:
+            panels = index[key].get(value)
+            if panels!=None:
+                panels.discard(panel)
+                if not panels:
+                    del index[key][value]
+        panel._watchers.pop(id(index["changed"]), None)
 
     def __str__(self):
         """
@@ -240,27 +518,290 @@ class DashBoard:
 
         """
         dbString = "title: %s\nuid: %s\nurl: %s\npanels: " % (self.title, self.uid, self.URL)
-        dbString += "%s" % len(self.panels)
+        dbString += "%s" % len(self.dictionary["dashboard"]["panels"])
         dbString += "\npanels per row: %s\npanel height: %s" % (self.panelsPerRow, self.panelHeight)
         return dbString
 
-    def push(self, postURL=None):
+    def push(self, postURL=None, session=None, state=None, compress=False):
         """
+        Parameters: optional postURL (defaults to the url set in the constructor), an optional
+            requests.Session to reuse pooled connections across pushes, and an optional PushState.
+            If a state is given and the dashboard's content hash matches the one recorded at its
+            last successful push, nothing is posted and None is returned. Set compress=True to
+            gzip the request body.
         Description: pushes the dashboard object to grafana, if there is an existing dashboard with 
             the same uid, it will be overwritten
         """
         if postURL==None:
             postURL=self.URL
-        if postURL==None:
-            raise Exception("No postURL set! Either provide a url in the constructor or set postURL=<url> in this method.")
-        self.dictionary["overwrite"] = True
-        response = requests.post(postURL, headers=self.headers, json=self.dictionary)
+        if state!=None:
+            digest = self.contentHash()
+            if state.isUnchanged(self._stateKey(), digest):
+                state.markSkipped()
+                instrument.count("pushes_skipped")
+                logger.info("%s unchanged, push skipped.", self.title)
+                return None
+        response = self._post(postURL, session, compress)
         if(response.status_code!=200):
+            instrument.count("push_errors")
             raise Exception("DashBoard could not be posted to %s. Status code: %s" % (postURL, response.status_code))
         else:
-            print("%s successfully posted." % (self.title))
+            logger.info("%s successfully posted.", self.title)
+        if state!=None:
+            state.record(self._stateKey(), digest)
+            state.save()
+        return response
+
+    def contentHash(self):
+        """
+        Returns: sha256 hex digest of this dashboard's normalized contents. Fields grafana changes
+            on every save (id, version, iteration) are ignored, and keys are sorted, so the hash
+            only changes when the dashboard itself does.
+        """
+        return hashlib.sha256(serializer.dumpBytes(self._normalized(), sortKeys=True)).hexdigest()
+
+    def _normalized(self):
+        """
+        Returns: this dashboard's dictionary without the fields grafana changes on every save, as
+            hashed by contentHash and kept by a DashboardHistory
+        """
+        contents = {}
+        for key, value in self.getDictionary()["dashboard"].items():
+            if key not in _volatileFields:
+                contents[key] = value
+        return {"dashboard": contents, "folderId": self.dictionary.get("folderId", self.dictionary.get("folderID"))}
+
+    def _stateKey(self):
+        """
+        Returns: key identifying this dashboard in a PushState, its uid if known, else its title
+        """
+        if self.uid!=None and self.uid!="unknown":
+            return self.uid
+        return self.title
+
+    async def apush(self, postURL=None, client=None, compress=False):
+        """
+        Parameters: optional postURL (defaults to the url set in the constructor), an optional
+            AsyncGrafanaClient whose connection pool should be shared with other requests, and
+            compress, set to True to gzip the request body
+        Returns: (status code, response text)
+        Description: asyncio version of push
+        """
+        if postURL==None:
+            postURL=self.URL
+        if postURL==None:
+            raise Exception("No postURL set! Either provide a url in the constructor or set postURL=<url> in this method.")
+        self.dictionary["overwrite"] = True
+        if client==None:
+            async with AsyncGrafanaClient(limit=1) as client:
+                return await self.apush(postURL, client, compress)
+        if self.budget!=None:
+            self.budget.check(self.getDictionary())
+        body, headers = self._requestBody(compress)
+        with instrument.timed("push"):
+            status, text = await client.post(postURL, headers=headers, data=body)
+        instrument.count("pushes")
+        if status!=200:
+            instrument.count("push_errors")
+            raise Exception("DashBoard could not be posted to %s. Status code: %s" % (postURL, status))
+        logger.info("%s successfully posted.", self.title)
+        if self.history!=None:
+            self._recordHistory()
+        return status, text
+
+    @classmethod
+    async def afrom_uid(cls, uid, token, url, client=None, panelsPerRow=2, panelHeight=8):
+        """
+        Parameters: uid, token and url as in the constructor, an optional AsyncGrafanaClient, and
+            optional panelsPerRow and panelHeight
+        Returns: a DashBoard initialized from the existing grafana dashboard with this uid
+        Description: asyncio version of DashBoard(uid=uid, token=token, url=url)
+        """
+        if url==None:
+            raise Exception("You must set url to initialize DashBoard with UID.")
+        if client==None:
+            async with AsyncGrafanaClient(limit=1) as client:
+                return await cls.afrom_uid(uid, token, url, client, panelsPerRow, panelHeight)
+        urlPlusUID = url + uid
+        with instrument.timed("fetch"):
+            status, text = await client.get(urlPlusUID, headers=_authHeaders(token))
+        instrument.count("fetches")
+        if status!=200:
+            raise Exception("Dashboard not found. \nStatus code %s \nURL: %s " % (status, urlPlusUID))
+        dashboard = cls(token=token, url=url, JSON=text, panelsPerRow=panelsPerRow, panelHeight=panelHeight)
+        dashboard.uid = uid
+        return dashboard
+
+    def _post(self, postURL, session=None, compress=False):
+        """
+        Parameters: url to post to, optional requests.Session, and whether to gzip the body
+        Returns: the response from grafana, whatever its status code
+        Description: private method shared by push and the bulk publisher
+        """
+        if postURL==None:
+            raise Exception("No postURL set! Either provide a url in the constructor or set postURL=<url> in this method.")
+        if self.budget!=None:
+            self.budget.check(self.getDictionary())
+        self.dictionary["overwrite"] = True
+        if session==None:
+            session = requests
+        body, headers = self._requestBody(compress)
+        with instrument.timed("push"):
+            response = session.post(postURL, headers=headers, data=body)
+        instrument.count("pushes")
+        if response.status_code==200 and self.history!=None:
+            self._recordHistory()
         return response
 
+    def _recordHistory(self):
+        """
+        Description: private method that records a successful push in this dashboard's history
+        """
+        normalized = self._normalized()
+        digest = hashlib.sha256(serializer.dumpBytes(normalized, sortKeys=True)).hexdigest()
+        self.history.record(self._stateKey(), normalized, digest)
+
+    def _requestBody(self, compress=False):
+        """
+        Returns: (encoded body, headers) for posting this dashboard's dictionary to grafana
+        """
+        body, extraHeaders = serializer.requestBody(self.getDictionary(), compress)
+        headers = self.headers
+        if extraHeaders:
+            headers = dict(self.headers, **extraHeaders)
+        return body, headers
+
+    def coalesceQueries(self, aggregate="sumSeries"):
+        """
+        Parameters: the zabbix aggregate function that adds up the series merged for a sum in a
+            MathStatPanel's math, or None (see planner.planQueries)
+        Returns: list of the QueryPlan of every panel
+        Description: merges each panel's targets that differ only in their host or item into regex
+            targets, where that gives the same result. Other panels' merged series are never added
+            up. Every panel keeps its plan as panel.queryPlan, see planner.uncoalesce to undo.
+        """
+        plans = [planner.coalesce(panel, aggregate) for panel in self.panels]
+        before = sum(len(plan.queries) for plan in plans)
+        after = sum(len(plan.targets) for plan in plans)
+        logger.info("Coalesced %s targets into %s on '%s'.", before, after, self.title)
+        return plans
+
+    def shard(self, maxPanels=None, maxTargets=None, mode="pages", shardKey=None, pageCount=None):
+        """
+        Parameters: maxPanels and/or maxTargets, the most panels and queries one page (or row) may
+            hold, mode, "pages" or "rows", shardKey, an optional function from a panel to the
+            string that decides its page (the panel's title by default), and pageCount, to pin the
+            number of pages instead of using the fewest that fit the limits
+        Returns: list of new dashboards. This dashboard is left as it is.
+        Description: splits a dashboard too large to load in one go.
+            mode="pages": panels are spread over several dashboards titled "<title> (i/N)", each with
+                this dashboard's links followed by links to all the pages. A panel's page is picked by hashing its shard key, so the same
+                panels always land on the same page with the same uid ("<uid>-p<i>", or derived from
+                the title for new dashboards), and adding or removing a panel only changes its own
+                page. When the number of pages grows, only about 1/N of the panels move, to the new
+                page, though every page's title and links change. Push the pages with a PushState
+                to skip the unchanged ones.
+            mode="rows": returns one dashboard, with the same uid, whose panels are grouped in order
+                into collapsed rows. Grafana only runs a row's queries once it is expanded.
+        """
+        if mode=="pages":
+            pages = sharding.assignPages(self.panels, maxPanels, maxTargets, shardKey, pageCount)
+            return self._shardPages(pages)
+        elif mode=="rows":
+            rows = sharding.assignRows(self.panels, maxPanels, maxTargets)
+            return [self._shardRows(rows)]
+        raise Exception("Unknown shard mode '%s', use 'pages' or 'rows'." % (mode))
+
+    def _shardCopy(self, title, uid):
+        """
+        Returns: a new dashboard with this dashboard's settings, title and uid, and no panels
+        """
+        dashboard = DashBoard(title=title, url=self.URL, panelsPerRow=self.panelsPerRow,
+                              panelHeight=self.panelHeight, pack=self.layout.pack)
+        dashboard.headers = self.headers
+        dashboard.queryOptions = dict(self.queryOptions)
+        dashboard.budget = self.budget
+        dashboard.history = self.history
+        dashboard.uid = uid
+        contents = {}
+        for key, value in self.dictionary["dashboard"].items():
+            if key!="panels":
+                contents[key] = _copyTemplate(value)
+        contents.update({"id": None, "uid": uid, "title": title, "panels": []})
+        dashboard.dictionary["dashboard"] = contents
+        return dashboard
+
+    def _shardPages(self, pages):
+        """
+        Returns: one new dashboard per page of panels, linked to each other
+        """
+        base = self._stateKey()
+        uids = [sharding.pageUID(base, i + 1) for i in range(len(pages))]
+        titles = ["%s (%s/%s)" % (self.title, i + 1, len(pages)) for i in range(len(pages))]
+        links = sharding.navigationLinks(uids, titles)
+        dashboards = []
+        for panels, uid, title in zip(pages, uids, titles):
+            dashboard = self._shardCopy(title, uid)
+            #the dashboard's own links come first, then the page navigation
+            dashboard.dictionary["dashboard"].setdefault("links", []).extend(_copyTemplate(links))
+            dashboard.addPanels(_copyPanel(panel) for panel in panels)
+            dashboards.append(dashboard)
+        logger.info("Sharded '%s' into %s pages.", self.title, len(dashboards))
+        return dashboards
+
+    def _shardRows(self, rows):
+        """
+        Returns: a new dashboard holding each list of panels in rows as a collapsed row
+        """
+        dashboard = self._shardCopy(self.title, self.uid)
+        rowPanels = []
+        panelID = 0
+        for i, panels in enumerate(rows):
+            rowID = panelID
+            panelID += 1
+            layout = GridLayout(self.panelsPerRow, self.panelHeight, self.layout.pack)
+            nested = []
+            for panel in panels:
+                copy = _copyPanel(panel)
+                layout.place(copy, panelID)
+                tuning.tune(copy, self.queryOptions)
+                panelID += 1
+                #positions inside a collapsed row are where the panels go once it is expanded
+                copy._setPosition(copy.getPosition()[0], copy.getPosition()[1] + i + 1)
+                nested.append(copy.getDictionary())
+            title = "%s - %s" % (panels[0].getTitle(), panels[-1].getTitle()) if panels else ""
+            rowPanels.append(sharding.rowPanel(title, rowID, i, nested))
+        dashboard.dictionary["dashboard"]["panels"] = rowPanels
+        #the row panels are plain dictionaries, hydrated like those of an imported dashboard
+        dashboard.panels = None
+        logger.info("Sharded '%s' into %s rows.", self.title, len(rowPanels))
+        return dashboard
+
+    def explain(self, refresh=None):
+        """
+        Parameters: optional refresh interval to assume ("30s", "1m", ...), the dashboard's own
+            refresh (or one minute) by default
+        Returns: an estimate.LoadReport of the targets, host/item pairs, datasource requests, points
+            and payload size of this dashboard. Worked out offline, from the dashboard's dictionary.
+        """
+        return estimate.explain(self.getDictionary(), refresh)
+
+    def setBudget(self, budget):
+        """
+        Parameters: an estimate.Budget, or None to remove the budget
+        Description: every push checks the dashboard against the budget first, and warns or
+            refuses to push when it is over
+        """
+        self.budget = budget
+
+    def setHistory(self, history):
+        """
+        Parameters: a history.DashboardHistory, or None to stop recording
+        Description: every successful push records the dashboard as a new local version, see
+            DashboardHistory.diff and DashboardHistory.rollback
+        """
+        self.history = history
+
     def rename(self, title):
         """
         Parameters: title to replace current title
@@ -272,7 +813,84 @@ class DashBoard:
         """
         Returns: string in json format of this dashboard.
         """
-        return json.dumps(self.dictionary)
+        return serializer.dumps(self.getDictionary())
+
+    def exportToFile(self, fileObj, panels=None):
+        """
+        Parameters: a file object opened for writing (text or binary, e.g. socket.makefile("wb")),
+            and an optional iterable of extra panels
+        Returns: number of panels written
+        Description: writes this dashboard as json, one panel at a time. Extra panels are laid out
+            after the dashboard's own panels and serialized as they arrive, without being added to
+            the dashboard, so a generator of panels never needs to be held in memory at once.
+        """
+        self.startStream(fileObj)
+        if panels!=None:
+            self.addPanels(panels)
+        return self.endStream()
+
+    def startStream(self, fileObj):
+        """
+        Parameters: a file object opened for writing (text or binary)
+        Description: writes everything in this dashboard up to and including its current panels.
+            Until endStream is called, addPanels writes panels to fileObj instead of keeping them.
+        """
+        if self._stream!=None:
+            raise Exception("A stream is already open on dashboard '%s'." % (self.title))
+        dictionary = self.getDictionary()
+        shell = dict(dictionary, dashboard=dict(dictionary["dashboard"], panels=_streamMarker))
+        prefix, suffix = serializer.dumps(shell).split('"%s"' % _streamMarker)
+        if len(self.layout.states)!=len(self.panels):
+            self.layout.seed(self.panels)
+        self._stream = {"file": fileObj, "binary": not isinstance(fileObj, io.TextIOBase),
+                        "suffix": suffix, "count": 0, "layout": self.layout._state()}
+        self._streamWrite(prefix + "[")
+        for panel in self.panels:
+            self._streamPanel(panel)
+
+    def endStream(self):
+        """
+        Returns: number of panels written to the stream opened by startStream
+        Description: finishes the json document and closes the stream (but not its file object)
+        """
+        if self._stream==None:
+            raise Exception("No stream is open on dashboard '%s'." % (self.title))
+        self._streamWrite("]" + self._stream["suffix"])
+        count = self._stream["count"]
+        #streamed panels are not part of the dashboard, so its own layout carries on where it was
+        self.layout._restore(self._stream["layout"])
+        self._stream = None
+        return count
+
+    def _streamPanels(self, panelArray):
+        """
+        Description: private method that lays out and writes streamed panels, keeping none of them
+        """
+        for panel in panelArray:
+            #streamed panels are never re-sorted, so the layout does not keep their cursor states
+            if isinstance(panel, RepeatedPanel) and panel.variable not in self._hostVariables():
+                raise Exception("Add repeated panel '%s' before starting the stream, its template variable is already written." % (panel.getTitle()))
+            self.layout.place(panel, self._stream["count"], remember=False)
+            tuning.tune(panel, self.queryOptions)
+            self._streamPanel(panel)
+
+    def _streamPanel(self, panel):
+        """
+        Description: private method that writes one panel to the open stream. The dashboard's own
+            panels are written first, so the count of panels written is also the next panel id.
+        """
+        separator = "," if self._stream["count"] else ""
+        self._streamWrite(separator + serializer.dumps(panel.getDictionary()))
+        self._stream["count"] += 1
+
+    def _streamWrite(self, text):
+        """
+        Description: private method that writes text to the open stream's file object
+        """
+        if self._stream["binary"]:
+            self._stream["file"].write(text.encode("utf-8"))
+        else:
+            self._stream["file"].write(text)
  
 ####################################################################
 
@@ -0,0 +1,80 @@
+"""
+On-disk cache of grafana dashboards keyed by uid and version, used by DashBoard.from_uids.
+
+Each cached dashboard is stored as the raw json returned by grafana in <directory>/<uid>.json,
+next to a small <uid>.version file, so checking whether an entry is current never requires
+reading or parsing the dashboard itself.
+"""
+
+import os
+import threading
+
+class DashboardCache:
+    def __init__(self, directory="~/.grafapy/dashboards"):
+        """
+        Parameters: directory to keep cached dashboards in, created if it does not exist
+        """
+        self.directory = os.path.expanduser(directory)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _path(self, uid, extension):
+        """
+        Returns: path of the cache file for uid with the given extension
+        """
+        safeUID = uid.replace("/", "_").replace(os.sep, "_")
+        return os.path.join(self.directory, safeUID + extension)
+
+    def getVersion(self, uid):
+        """
+        Returns: the cached version of the dashboard with this uid, or None if it is not cached
+        """
+        try:
+            with open(self._path(uid, ".version")) as versionFile:
+                return int(versionFile.read())
+        except (IOError, ValueError):
+            return None
+
+    def get(self, uid, version):
+        """
+        Parameters: uid, and the version grafana currently reports for it
+        Returns: the cached json bytes if the cached copy is at that version, else None
+        """
+        if version==None or self.getVersion(uid)!=version:
+            with self.lock:
+                self.misses += 1
+            return None
+        try:
+            with open(self._path(uid, ".json"), "rb") as dashFile:
+                data = dashFile.read()
+        except IOError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return data
+
+    def put(self, uid, version, data):
+        """
+        Parameters: uid, version, and the json (str or bytes) grafana returned for this dashboard
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        jsonPath = self._path(uid, ".json")
+        with open(jsonPath + ".tmp", "wb") as dashFile:
+            dashFile.write(data)
+        os.replace(jsonPath + ".tmp", jsonPath)
+        versionPath = self._path(uid, ".version")
+        with open(versionPath + ".tmp", "w") as versionFile:
+            versionFile.write(str(version))
+        os.replace(versionPath + ".tmp", versionPath)
+
+    def summary(self):
+        """
+        Returns: string with the number of cache hits and misses
+        """
+        return "%s loaded from cache, %s downloaded" % (self.hits, self.misses)
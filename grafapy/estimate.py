@@ -0,0 +1,235 @@
+"""
+Offline estimate of the load a dashboard puts on zabbix, and budgets that push enforces.
+
+Everything is worked out from the dashboard's dictionary, without asking grafana or zabbix:
+grafana-zabbix sends one history request per target each time the dashboard refreshes, and a
+target whose host or item filter is a /^(a|b|c)$/ regex (see planner.py) fetches one series per
+name in it. A repeated panel is drawn, and queried, once for every value of its template
+variable. Panels inside collapsed rows are only queried once their row is expanded, so they are
+counted separately as deferred.
+
+    report = dashboard.explain()
+    print(report)
+    dashboard.setBudget(Budget(maxRequestsPerMinute=600, action="refuse"))
+"""
+
+import re
+import serializer
+import instrument
+
+logger = instrument.getLogger("estimate")
+
+#assumed refresh interval for dashboards that do not refresh on their own, in seconds
+defaultRefresh = 60
+#grafana's own default when a panel does not set maxDataPoints
+defaultMaxDataPoints = 100
+
+_durationUnits = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parseDuration(value):
+    """
+    Parameters: a grafana duration, e.g. "30s", "5m" or "1h"
+    Returns: the duration in seconds, or None if value is empty or not a duration
+    """
+    if not isinstance(value, str):
+        return None
+    match = re.match(r"^\s*(\d+)\s*([smhd])\s*$", value)
+    if match==None:
+        return None
+    return int(match.group(1)) * _durationUnits[match.group(2)]
+
+def _filterNames(value):
+    """
+    Returns: list of the names a host or item filter matches, or None for an open ended regex
+    """
+    if value.startswith("/") and value.endswith("/") and len(value) > 1:
+        match = re.match(r"^/\^\((.*)\)\$/$", value)
+        if match==None:
+            return None
+        return [re.sub(r"\\(.)", r"\1", name) for name in re.split(r"(?<!\\)\|", match.group(1))]
+    return [value]
+
+def _maxDataPoints(panel):
+    """
+    Returns: the number of points each series of panel is fetched with
+    """
+    try:
+        return int(panel.get("maxDataPoints") or defaultMaxDataPoints)
+    except (TypeError, ValueError):
+        return defaultMaxDataPoints
+
+def _variableValues(dashboard):
+    """
+    Returns: dictionary of the dashboard's template variable names to their values (without "All")
+    """
+    variables = {}
+    for entry in dashboard.get("templating", {}).get("list", []):
+        variables[entry.get("name")] = [option["value"] for option in entry.get("options", [])
+                                        if option.get("value")!="$__all"]
+    return variables
+
+def _repeatValues(panel, variables):
+    """
+    Returns: list of (variable, value) for every copy grafana draws of panel, [(None, None)] if it
+        is not repeated
+    """
+    variable = panel.get("repeat")
+    if not variable or not variables.get(variable):
+        return [(None, None)]
+    return [(variable, value) for value in variables[variable]]
+
+def _substitute(value, variable, replacement):
+    """
+    Returns: value with $variable replaced, as grafana does in each copy of a repeated panel
+    """
+    if variable==None:
+        return value
+    return re.sub(r"\$(%s\b|\{%s\})" % (re.escape(variable), re.escape(variable)), lambda match: replacement, value)
+
+class LoadReport:
+    def __init__(self, title):
+        """
+        Parameters: title of the estimated dashboard
+            NOTE: LoadReports are built by explain, this constructor should not be called directly.
+        """
+        self.title = title
+        self.panels = 0
+        self.targets = 0
+        self.deferredPanels = 0
+        self.deferredTargets = 0
+        self.hostItems = set()
+        self.series = 0
+        self.openRegexTargets = 0
+        self.points = 0
+        self.refresh = defaultRefresh
+        self.refreshSet = False
+        self.payloadBytes = 0
+
+    def requestsPerRefresh(self):
+        """
+        Returns: datasource requests sent each time the dashboard refreshes, one per queried target
+        """
+        return self.targets
+
+    def requestsPerMinute(self):
+        """
+        Returns: datasource requests per minute from one open copy of the dashboard
+        """
+        return self.requestsPerRefresh() * 60.0 / self.refresh
+
+    def toDict(self):
+        """
+        Returns: dictionary of every estimate, ready to be dumped as json
+        """
+        return {"title": self.title, "panels": self.panels, "targets": self.targets,
+                "deferredPanels": self.deferredPanels, "deferredTargets": self.deferredTargets,
+                "hostItemPairs": len(self.hostItems), "series": self.series,
+                "openRegexTargets": self.openRegexTargets, "refreshSeconds": self.refresh,
+                "requestsPerRefresh": self.requestsPerRefresh(), "requestsPerMinute": self.requestsPerMinute(),
+                "pointsPerRefresh": self.points, "payloadBytes": self.payloadBytes}
+
+    def __str__(self):
+        """
+        Returns: the report as lines of text
+        """
+        refresh = "every %ss" % self.refresh if self.refreshSet else "assumed every %ss" % self.refresh
+        lines = ["dashboard:            %s" % self.title,
+                 "panels:               %s (+%s in collapsed rows)" % (self.panels, self.deferredPanels),
+                 "targets:              %s (+%s in collapsed rows)" % (self.targets, self.deferredTargets),
+                 "host/item pairs:      %s" % len(self.hostItems),
+                 "series:               %s" % self.series,
+                 "refresh:              %s" % refresh,
+                 "requests per refresh: %s" % self.requestsPerRefresh(),
+                 "requests per minute:  %.1f" % self.requestsPerMinute(),
+                 "points per refresh:   %s" % self.points,
+                 "payload:              %s bytes" % self.payloadBytes]
+        if self.openRegexTargets:
+            lines.append("note: %s target(s) use an open ended regex, counted as one series each" % self.openRegexTargets)
+        return "\n".join(lines)
+
+def explain(dictionary, refresh=None):
+    """
+    Parameters: a dashboard dictionary (see DashBoard.getDictionary), and an optional refresh
+        interval ("30s", "1m", ...) to assume instead of the dashboard's own
+    Returns: a LoadReport
+    """
+    dashboard = dictionary["dashboard"]
+    report = LoadReport(dashboard.get("title"))
+    seconds = parseDuration(refresh if refresh!=None else dashboard.get("refresh"))
+    if seconds!=None:
+        report.refresh = seconds
+        report.refreshSet = True
+
+    variables = _variableValues(dashboard)
+    for panel in dashboard.get("panels", []):
+        if panel.get("type")=="row":
+            for nested in panel.get("panels", []):
+                copies = len(_repeatValues(nested, variables))
+                report.deferredPanels += copies
+                report.deferredTargets += copies * len(nested.get("targets", []))
+            continue
+        points = _maxDataPoints(panel)
+        for variable, value in _repeatValues(panel, variables):
+            report.panels += 1
+            for target in panel.get("targets", []):
+                report.targets += 1
+                hosts = _filterNames(_substitute(target.get("host", {}).get("filter", ""), variable, value))
+                items = _filterNames(_substitute(target.get("item", {}).get("filter", ""), variable, value))
+                if hosts==None or items==None:
+                    report.openRegexTargets += 1
+                    series = 1
+                else:
+                    series = len(hosts) * len(items)
+                    for host in hosts:
+                        for item in items:
+                            report.hostItems.add((host, item))
+                report.series += series
+                report.points += series * points
+
+    report.payloadBytes = len(serializer.dumpBytes(dictionary))
+    return report
+
+class Budget:
+    def __init__(self, maxRequestsPerMinute=None, maxPointsPerRefresh=None, maxPayloadBytes=None, action="warn", refresh=None):
+        """
+        Parameters: the most requests per minute, points per refresh and payload bytes a dashboard
+            may cost (None for no limit), action, "warn" to log a warning or "refuse" to raise
+            instead of pushing, and refresh, the interval to assume (see explain)
+        """
+        if action not in ("warn", "refuse"):
+            raise Exception("Budget action must be 'warn' or 'refuse', not '%s'" % action)
+        self.maxRequestsPerMinute = maxRequestsPerMinute
+        self.maxPointsPerRefresh = maxPointsPerRefresh
+        self.maxPayloadBytes = maxPayloadBytes
+        self.action = action
+        self.refresh = refresh
+
+    def violations(self, report):
+        """
+        Parameters: a LoadReport
+        Returns: list of strings, one for every limit the report exceeds
+        """
+        found = []
+        if self.maxRequestsPerMinute!=None and report.requestsPerMinute() > self.maxRequestsPerMinute:
+            found.append("%.1f requests/minute > %s" % (report.requestsPerMinute(), self.maxRequestsPerMinute))
+        if self.maxPointsPerRefresh!=None and report.points > self.maxPointsPerRefresh:
+            found.append("%s points/refresh > %s" % (report.points, self.maxPointsPerRefresh))
+        if self.maxPayloadBytes!=None and report.payloadBytes > self.maxPayloadBytes:
+            found.append("%s bytes > %s" % (report.payloadBytes, self.maxPayloadBytes))
+        return found
+
+    def check(self, dictionary):
+        """
+        Parameters: a dashboard dictionary
+        Returns: the LoadReport
+        Description: logs a warning, or raises if action is "refuse", when the dashboard is over budget
+        """
+        report = explain(dictionary, self.refresh)
+        found = self.violations(report)
+        if found:
+            instrument.count("budget_violations")
+            message = "Dashboard '%s' is over its load budget: %s" % (report.title, "; ".join(found))
+            if self.action=="refuse":
+                raise Exception(message)
+            logger.warning(message)
+        return report
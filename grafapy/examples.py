@@ -4,6 +4,7 @@ Examples for grafaPy API.
 """
 from dashboard import *
 from panel import *
+import logging
 import os
 import sys
 
@@ -192,6 +193,8 @@ def example4(token, URL):
     d.push()
 
 def main():
+    #grafapy reports what it is doing through the logging module
+    logging.basicConfig(level=logging.INFO)
     grafAuth = os.environ["HOME"] + "/grafanaToken"
     token, URL = getCredentials(grafAuth)
     example1(token)
@@ -0,0 +1,263 @@
+"""
+Local version history of pushed dashboards.
+
+Every dashboard pushed while a DashboardHistory is set (see DashBoard.setHistory) is recorded as
+a new local version, unless it is the same as the last one. Versions are appended to
+<directory>/<uid>.jsonl, one json line each: the first version, and every snapshotEvery-th after
+it, in full, and the others as a structural delta from the version before. A delta only holds
+the values that changed, so a version that moves or edits a few panels costs a few hundred
+bytes rather than a copy of the whole dashboard.
+
+    history = DashboardHistory("~/.grafapy/history")
+    d.setHistory(history)
+    d.push()
+    ...
+    print(history.formatDiff(history.diff(uid, 3, 4)))
+    history.rollback(uid, 3, token=token, url=url).push()
+
+Nothing here talks to grafana: diff and rollback only read the local files.
+
+A delta is a list of operations, applied in order, each on a path of dictionary keys and list
+indexes from the top of the dashboard:
+    ["s", path, value]    sets a value
+    ["d", path]           deletes a dictionary key
+    ["i", path, value]    inserts value into a list, at the index path ends with
+    ["r", path]           removes the list element at path
+"""
+
+import difflib
+import hashlib
+import os
+import threading
+import time
+import serializer
+import instrument
+from dashboard import DashBoard
+from panel import _copyTemplate
+
+logger = instrument.getLogger("history")
+
+def _signature(value):
+    """
+    Returns: what a list element is matched on between versions. Panels are matched without their
+        id and position, which change whenever an earlier panel is added or removed.
+    """
+    if isinstance(value, dict):
+        value = dict((key, v) for key, v in value.items() if key not in ("id", "gridPos"))
+    return serializer.dumpBytes(value, sortKeys=True)
+
+def delta(old, new, path=None, ops=None):
+    """
+    Parameters: two json values (e.g. dashboard dictionaries)
+    Returns: list of operations that turn old into new (see the module description)
+    """
+    if path==None:
+        path = []
+    if ops==None:
+        ops = []
+    if type(old) is not type(new):
+        ops.append(["s", path, new])
+    elif isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append(["d", path + [key]])
+        for key, value in new.items():
+            if key not in old:
+                ops.append(["s", path + [key], value])
+            else:
+                delta(old[key], value, path + [key], ops)
+    elif isinstance(new, list):
+        if len(old)==len(new):
+            for i in range(len(new)):
+                delta(old[i], new[i], path + [i], ops)
+            return ops
+        #elements were added or removed, so line the lists up first. Indexes refer to the list as
+        #it is when the operation is applied, where new[:j1] is already in place.
+        matcher = difflib.SequenceMatcher(None, [_signature(v) for v in old], [_signature(v) for v in new], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            common = min(i2 - i1, j2 - j1)
+            for k in range(common):
+                delta(old[i1 + k], new[j1 + k], path + [j1 + k], ops)
+            for k in range(i2 - i1 - common):
+                ops.append(["r", path + [j1 + common]])
+            for k in range(common, j2 - j1):
+                ops.append(["i", path + [j1 + k], new[j1 + k]])
+    elif old!=new:
+        ops.append(["s", path, new])
+    return ops
+
+def applyDelta(value, ops):
+    """
+    Parameters: a json value and a list of operations made by delta
+    Returns: the changed value. value is modified in place, unless an operation replaces all of it.
+    """
+    for op in ops:
+        path = op[1]
+        if op[0]=="s" and not path:
+            value = _copyTemplate(op[2])
+            continue
+        parent = value
+        for key in path[:-1]:
+            parent = parent[key]
+        if op[0]=="s":
+            parent[path[-1]] = _copyTemplate(op[2])
+        elif op[0]=="i":
+            parent.insert(path[-1], _copyTemplate(op[2]))
+        else:
+            del parent[path[-1]]
+    return value
+
+class DashboardHistory:
+    def __init__(self, directory="~/.grafapy/history", snapshotEvery=25):
+        """
+        Parameters: directory to keep history files in, created if it does not exist, and how often
+            a version is stored in full instead of as a delta (bounds the deltas applied per read)
+        """
+        self.directory = os.path.expanduser(directory)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.snapshotEvery = snapshotEvery
+        self.records = {}
+        self.latest = {}
+        self.lock = threading.Lock()
+
+    def _path(self, uid):
+        """
+        Returns: path of the history file for uid
+        """
+        safeUID = uid.replace("/", "_").replace(os.sep, "_")
+        return os.path.join(self.directory, safeUID + ".jsonl")
+
+    def _records(self, uid):
+        """
+        Returns: list of the stored records of uid, read from disk on first use
+        """
+        if uid not in self.records:
+            records = []
+            if os.path.exists(self._path(uid)):
+                with open(self._path(uid)) as historyFile:
+                    for line in historyFile:
+                        if line.strip():
+                            records.append(serializer.loads(line))
+            self.records[uid] = records
+        return self.records[uid]
+
+    def record(self, uid, dictionary, digest=None):
+        """
+        Parameters: uid (or other key) of a dashboard, its dictionary, and optionally its content hash
+        Returns: the new version number, or None if the dashboard is the same as its latest version
+        """
+        if digest==None:
+            digest = hashlib.sha256(serializer.dumpBytes(dictionary, sortKeys=True)).hexdigest()
+        with self.lock:
+            records = self._records(uid)
+            if records and records[-1]["hash"]==digest:
+                return None
+            version = len(records) + 1
+            record = {"version": version, "time": round(time.time(), 3), "hash": digest}
+            if not records or (version - 1) % self.snapshotEvery==0:
+                record["full"] = dictionary
+            else:
+                record["delta"] = delta(self._latest(uid), dictionary)
+            line = serializer.dumps(record)
+            with open(self._path(uid), "a") as historyFile:
+                historyFile.write(line + "\n")
+            records.append(_copyTemplate(record))
+            self.latest[uid] = (version, _copyTemplate(dictionary))
+        instrument.count("history_versions")
+        logger.debug("Recorded version %s of %s (%s bytes).", version, uid, len(line))
+        return version
+
+    def _latest(self, uid):
+        """
+        Returns: the dictionary of uid's latest version
+        """
+        records = self._records(uid)
+        cached = self.latest.get(uid)
+        if cached==None or cached[0]!=len(records):
+            cached = (len(records), self._build(uid, len(records)))
+            self.latest[uid] = cached
+        return cached[1]
+
+    def _build(self, uid, version):
+        """
+        Returns: a new copy of the dictionary of version of uid, from its closest full snapshot
+        """
+        records = self._records(uid)
+        if version < 1 or version > len(records):
+            raise Exception("Dashboard '%s' has no local version %s (it has %s)." % (uid, version, len(records)))
+        start = version - 1
+        while "full" not in records[start]:
+            start -= 1
+        value = _copyTemplate(records[start]["full"])
+        for record in records[start + 1:version]:
+            value = applyDelta(value, record["delta"])
+        return value
+
+    def versions(self, uid):
+        """
+        Returns: list of (version, time pushed, content hash) of uid, oldest first
+        """
+        with self.lock:
+            return [(record["version"], record["time"], record["hash"]) for record in self._records(uid)]
+
+    def get(self, uid, version):
+        """
+        Returns: the dashboard dictionary of version of uid
+        """
+        with self.lock:
+            return self._build(uid, version)
+
+    def diff(self, uid, v1, v2):
+        """
+        Returns: list of operations (see the module description) that turn version v1 of uid into v2
+        """
+        with self.lock:
+            records = self._records(uid)
+            if v2==v1 + 1 and 1 <= v1 < len(records) and "delta" in records[v2 - 1]:
+                return list(records[v2 - 1]["delta"])
+            return delta(self._build(uid, v1), self._build(uid, v2))
+
+    def formatDiff(self, ops):
+        """
+        Parameters: list of operations returned by diff
+        Returns: the operations as lines of text, one per operation
+        """
+        lines = []
+        for op in ops:
+            path = "/".join(str(key) for key in op[1]) or "/"
+            if op[0]=="s":
+                value = serializer.dumps(op[2])
+                if len(value) > 80:
+                    value = value[:77] + "..."
+                lines.append("set %s = %s" % (path, value))
+            elif op[0]=="i":
+                value = serializer.dumps(op[2])
+                if len(value) > 80:
+                    value = value[:77] + "..."
+                lines.append("insert %s = %s" % (path, value))
+            else:
+                lines.append("delete %s" % path)
+        return "\n".join(lines)
+
+    def rollback(self, uid, version, token=None, url=None):
+        """
+        Parameters: uid, the local version to go back to, and the token and url to push with
+        Returns: a DashBoard holding that version, ready to push. Pushing it records a new version.
+        """
+        dashboard = DashBoard(token=token, url=url, JSON=self.get(uid, version))
+        dashboard.uid = uid
+        logger.info("Rolled %s back to local version %s.", uid, version)
+        return dashboard
+
+    def summary(self):
+        """
+        Returns: string with the number of dashboards and versions in the history, and its size on disk
+        """
+        files = [name for name in os.listdir(self.directory) if name.endswith(".jsonl")]
+        size = sum(os.path.getsize(os.path.join(self.directory, name)) for name in files)
+        versions = 0
+        for name in files:
+            with open(os.path.join(self.directory, name)) as historyFile:
+                versions += sum(1 for line in historyFile if line.strip())
+        return "%s dashboard(s), %s version(s), %s bytes" % (len(files), versions, size)
@@ -0,0 +1,199 @@
+"""
+Logging and instrumentation for grafapy.
+
+grafapy logs through the "grafapy" logger (and its children, e.g. "grafapy.dashboard")
+instead of printing. Configure it like any other logger:
+
+    logging.basicConfig(level=logging.INFO)
+
+Timing and counter hooks can be registered to observe the library's phases:
+    panel_build, layout, serialize, push, fetch, build and compile (timings, in seconds)
+    panels_built, panels_cloned, panels_added, panels_removed, bytes_serialized, pushes,
+    pushes_skipped, push_errors, fetches, inventory_fetches, budget_violations, dashboards_built,
+    dashboards_compiled and history_versions (counters)
+
+A timing hook is called as hook(phase, seconds) and a counter hook as hook(name, amount).
+When no hooks are registered, instrumentation costs one list check per call.
+
+Stats collects every timing and counter and can dump them for a scheduler to scrape:
+
+    stats = Stats().install()
+    ...generate and push dashboards...
+    stats.writeTo("/var/lib/node_exporter/grafapy.prom")
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("grafapy")
+
+_timingHooks = []
+_counterHooks = []
+
+def getLogger(name):
+    """
+    Parameters: name of a grafapy module
+    Returns: the logger that module should log to, a child of the "grafapy" logger
+    """
+    return logging.getLogger("grafapy." + name)
+
+def addTimingHook(hook):
+    """
+    Parameters: callable taking (phase, seconds), called at the end of every timed phase
+    """
+    _timingHooks.append(hook)
+
+def removeTimingHook(hook):
+    """
+    Parameters: a hook previously passed to addTimingHook
+    """
+    _timingHooks.remove(hook)
+
+def addCounterHook(hook):
+    """
+    Parameters: callable taking (name, amount), called every time a counter is incremented
+    """
+    _counterHooks.append(hook)
+
+def removeCounterHook(hook):
+    """
+    Parameters: a hook previously passed to addCounterHook
+    """
+    _counterHooks.remove(hook)
+
+class _Timer:
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        for hook in list(_timingHooks):
+            hook(self.phase, elapsed)
+        return False
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, exc, tb):
+        return False
+
+_nullTimer = _NullTimer()
+
+def timed(phase):
+    """
+    Parameters: name of the phase being timed
+    Returns: a context manager that reports the time spent in its block to every timing hook
+    """
+    if not _timingHooks:
+        return _nullTimer
+    return _Timer(phase)
+
+def count(name, amount=1):
+    """
+    Parameters: counter name, and the amount to increment it by
+    """
+    if _counterHooks:
+        for hook in list(_counterHooks):
+            hook(name, amount)
+
+class Stats:
+    def __init__(self):
+        """
+        Description: collects timings (count, total and max seconds per phase) and counters from
+            the instrumentation hooks. Call install() to start collecting.
+        """
+        self.timings = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def install(self):
+        """
+        Returns: this Stats object, now registered as a timing and counter hook
+        """
+        addTimingHook(self.timing)
+        addCounterHook(self.counter)
+        return self
+
+    def uninstall(self):
+        """
+        Description: stops collecting. Collected values are kept.
+        """
+        removeTimingHook(self.timing)
+        removeCounterHook(self.counter)
+
+    def timing(self, phase, seconds):
+        """
+        Parameters: phase name and seconds spent in it
+        """
+        with self.lock:
+            entry = self.timings.get(phase)
+            if entry==None:
+                entry = self.timings[phase] = {"count": 0, "seconds": 0.0, "max": 0.0}
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            if seconds > entry["max"]:
+                entry["max"] = seconds
+
+    def counter(self, name, amount):
+        """
+        Parameters: counter name and amount to add
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def reset(self):
+        """
+        Description: forgets everything collected so far
+        """
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+
+    def toJSON(self):
+        """
+        Returns: json string of the collected timings and counters
+        """
+        with self.lock:
+            return json.dumps({"timings": self.timings, "counters": self.counters}, sort_keys=True)
+
+    def toPrometheus(self, prefix="grafapy"):
+        """
+        Parameters: prefix for the metric names
+        Returns: the collected timings and counters in the prometheus text exposition format
+        """
+        lines = []
+        with self.lock:
+            lines.append("# TYPE %s_phase_seconds summary" % prefix)
+            for phase in sorted(self.timings):
+                entry = self.timings[phase]
+                lines.append('%s_phase_seconds_count{phase="%s"} %d' % (prefix, phase, entry["count"]))
+                lines.append('%s_phase_seconds_sum{phase="%s"} %.6f' % (prefix, phase, entry["seconds"]))
+            lines.append("# TYPE %s_phase_seconds_max gauge" % prefix)
+            for phase in sorted(self.timings):
+                lines.append('%s_phase_seconds_max{phase="%s"} %.6f' % (prefix, phase, self.timings[phase]["max"]))
+            lines.append("# TYPE %s_events_total counter" % prefix)
+            for name in sorted(self.counters):
+                lines.append('%s_events_total{event="%s"} %d' % (prefix, name, self.counters[name]))
+        return "\n".join(lines) + "\n"
+
+    def writeTo(self, path, format="prometheus"):
+        """
+        Parameters: path of the file to write, and format, "prometheus" or "json"
+        """
+        if format=="prometheus":
+            text = self.toPrometheus()
+        elif format=="json":
+            text = self.toJSON()
+        else:
+            raise Exception("Unknown stats format '%s', use 'prometheus' or 'json'." % format)
+        with open(path + ".tmp", "w") as statsFile:
+            statsFile.write(text)
+        os.replace(path + ".tmp", path)
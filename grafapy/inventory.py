@@ -0,0 +1,113 @@
+"""
+Cached zabbix host inventory.
+
+HostInventory expands host groups into host names with a single hostgroup.get call per batch of
+groups (using selectHosts), and caches the result in memory and, optionally, on disk, so that
+regenerating many dashboards in one run (or in several runs within the ttl) does not query
+zabbix again:
+
+    inventory = HostInventory(zabbixAPI, cachePath="~/.grafapy/inventory.json", ttl=600)
+    hostsByGroup = inventory.getHostsForGroups(["Lab_238", "Lab_240"])
+
+zabbixAPI is a pyzabbix.ZabbixAPI, or anything with the same hostgroup.get method.
+"""
+
+import json
+import os
+import threading
+import time
+import instrument
+
+logger = instrument.getLogger("inventory")
+
+class HostInventory:
+    def __init__(self, zabbixAPI, cachePath=None, ttl=300):
+        """
+        Parameters: a logged in zabbix api object, an optional path of a json file to cache groups in
+            between runs, and ttl, the number of seconds a cached group stays valid
+        """
+        self.zabbixAPI = zabbixAPI
+        self.cachePath = None
+        if cachePath!=None:
+            self.cachePath = os.path.expanduser(cachePath)
+        self.ttl = ttl
+        self.groups = {}
+        self.lock = threading.Lock()
+        if self.cachePath!=None and os.path.exists(self.cachePath):
+            try:
+                with open(self.cachePath) as cacheFile:
+                    self.groups = json.load(cacheFile)
+            except ValueError:
+                logger.warning("Ignoring unreadable inventory cache %s", self.cachePath)
+
+    def getHosts(self, group):
+        """
+        Parameters: name of a zabbix host group
+        Returns: sorted list of the names of the hosts in the group
+        """
+        return self.getHostsForGroups([group])[group]
+
+    def getHostsForGroups(self, groups):
+        """
+        Parameters: list of zabbix host group names
+        Returns: dictionary of group name to sorted list of host names. Groups not cached (or whose
+            cache entry is older than the ttl) are fetched together in one zabbix call.
+        """
+        groups = list(groups)
+        now = time.time()
+        with self.lock:
+            stale = [group for group in groups if not self._isFresh(group, now)]
+        if stale:
+            self._fetch(stale)
+        with self.lock:
+            return dict((group, list(self.groups[group]["hosts"])) for group in groups)
+
+    def refresh(self, groups=None):
+        """
+        Parameters: optional list of group names, all cached groups if not given
+        Description: fetches the groups from zabbix again, regardless of their age
+        """
+        if groups==None:
+            groups = list(self.groups)
+        if groups:
+            self._fetch(list(groups))
+
+    def _isFresh(self, group, now):
+        """
+        Returns: bool, true if group is cached and younger than the ttl
+        """
+        entry = self.groups.get(group)
+        return entry!=None and now - entry["fetched"] < self.ttl
+
+    def _fetch(self, groups):
+        """
+        Description: private method that expands groups with a single hostgroup.get call and caches them
+        """
+        with instrument.timed("fetch"):
+            result = self.zabbixAPI.hostgroup.get(output=["groupid", "name"], filter={"name": groups}, selectHosts=["host"])
+        instrument.count("inventory_fetches")
+        fetched = time.time()
+        found = {}
+        for group in result:
+            found[group["name"]] = sorted(host["host"] for host in group.get("hosts", []))
+        missing = [group for group in groups if group not in found]
+        if missing:
+            raise Exception("Host group(s) not found in zabbix: %s" % ", ".join(missing))
+        with self.lock:
+            for name, hosts in found.items():
+                self.groups[name] = {"hosts": hosts, "fetched": fetched}
+            self._save()
+        logger.info("Fetched %s host group(s) from zabbix", len(found))
+
+    def _save(self):
+        """
+        Description: private method that writes the cache file, if there is one
+        """
+        if self.cachePath==None:
+            return
+        directory = os.path.dirname(self.cachePath)
+        if directory!="" and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(self.cachePath + ".tmp", "w") as cacheFile:
+            json.dump(self.groups, cacheFile, sort_keys=True)
+        os.replace(self.cachePath + ".tmp", self.cachePath)
@@ -0,0 +1,137 @@
+"""
+Grid layout engine used by DashBoard to give panels integer ids, sizes and positions on
+grafana's 24 column grid.
+
+By default panels are placed one row at a time, left to right, with a cursor that remembers
+where the next panel goes, so adding panels only touches the new ones. A row ends when the next
+panel does not fit, or when it already holds panelsPerRow panels of the default size and the next
+one has the default size too (24 // panelsPerRow columns can leave room for more). With pack=True each
+panel instead drops into the lowest free spot that fits it (a skyline packer), which fills
+the gaps left by panels of mixed heights.
+
+The cursor state before every placed panel is kept, so after a removal only the panels
+from the first removed one onwards are placed again.
+"""
+
+gridColumns = 24
+
+class GridLayout:
+    def __init__(self, panelsPerRow=2, panelHeight=8, pack=False):
+        """
+        Parameters: panelsPerRow, the most default sized panels in a row, which also sets their
+            width (24 // panelsPerRow), panelHeight, the default panel height, and pack, set to
+            True to pack panels of mixed sizes. Panels whose size was set with Panel.setSize keep
+            their own size.
+        """
+        self.panelsPerRow = max(1, panelsPerRow)
+        self.width = max(1, gridColumns // self.panelsPerRow)
+        self.height = panelHeight
+        self.pack = pack
+        self.reset()
+
+    def reset(self):
+        """
+        Description: forgets every placed panel and moves the cursor back to the top left
+        """
+        self.states = []
+        self.x = 0
+        self.y = 0
+        self.rowHeight = 0
+        self.rowPanels = 0
+        self.skyline = [0] * gridColumns
+
+    def _state(self):
+        """
+        Returns: the cursor state, as saved before each placement
+        """
+        if self.pack:
+            return tuple(self.skyline)
+        return (self.x, self.y, self.rowHeight, self.rowPanels)
+
+    def _restore(self, state):
+        """
+        Parameters: a state returned by _state
+        """
+        if self.pack:
+            self.skyline = list(state)
+        else:
+            self.x, self.y, self.rowHeight, self.rowPanels = state
+
+    def place(self, panel, panelID, remember=True):
+        """
+        Parameters: panel to place, the id to give it, and remember, set to False for panels that will
+            never be placed again by relayout (their cursor state is then not kept)
+        Description: sizes the panel (unless its size was already set), and places it at the cursor,
+            or in the lowest free spot if packing
+        """
+        defaultSize = not panel._sizeSet()
+        if not defaultSize:
+            h, w = panel.getSize()
+        else:
+            h, w = self.height, self.width
+            panel._setSize(h, w)
+        h = int(h)
+        w = min(int(w), gridColumns)
+        if remember:
+            self.states.append(self._state())
+        if self.pack:
+            x, y = self._lowestFit(w)
+            for column in range(x, x + w):
+                self.skyline[column] = y + h
+        else:
+            if self.x + w > gridColumns or (defaultSize and self.rowPanels>=self.panelsPerRow):
+                self.y += self.rowHeight
+                self.x = 0
+                self.rowHeight = 0
+                self.rowPanels = 0
+            x, y = self.x, self.y
+            self.x += w
+            if defaultSize:
+                self.rowPanels += 1
+            if h > self.rowHeight:
+                self.rowHeight = h
+        panel.setID(panelID)
+        panel._setPosition(x, y)
+
+    def _lowestFit(self, w):
+        """
+        Returns: (x, y) of the highest up, then leftmost, spot where a panel w columns wide fits
+        """
+        bestX, bestY = 0, None
+        for x in range(gridColumns - w + 1):
+            y = max(self.skyline[x:x + w])
+            if bestY==None or y < bestY:
+                bestX, bestY = x, y
+        return bestX, bestY
+
+    def seed(self, panels):
+        """
+        Parameters: panels that already have positions (for example from an imported dashboard)
+        Description: starts the layout below those panels without moving them. A later relayout
+            that reaches back into seeded panels lays everything out again from the start.
+        """
+        self.reset()
+        for panel in panels:
+            h, w = panel.getSize()
+            x, y = panel.getPosition()
+            bottom = int(y) + int(h)
+            for column in range(max(0, int(x)), min(gridColumns, int(x) + int(w))):
+                if bottom > self.skyline[column]:
+                    self.skyline[column] = bottom
+            self.states.append(None)
+        self.y = max(self.skyline)
+
+    def relayout(self, panels, start=0):
+        """
+        Parameters: the dashboard's full list of panels, and the index of the first panel that
+            needs to be placed again. Panels before start must be unchanged since they were placed.
+        """
+        if start > len(self.states) or (start < len(self.states) and self.states[start]==None):
+            start = 0
+        if start==0:
+            self.reset()
+        elif start < len(self.states):
+            self._restore(self.states[start])
+            del self.states[start:]
+        for i in range(start, len(panels)):
+            self.place(panels[i], i)
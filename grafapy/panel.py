@@ -7,34 +7,130 @@ custom grafana API. Panels are the data displays that can be
 created in a dashboard. Currently supported types of panels:
     - GraphPanel
     - SingleStatPanel
+    - MathStatPanel
+    - RepeatedPanel (any of the above, repeated by grafana for every host)
 """
 
 import json
+import os
+import re
 import sys
+import serializer
+import instrument
+import tuning
+from layout import gridColumns
+
+logger = instrument.getLogger("panel")
 
 colorDictionary = {"red":"#C4162A", "blue":"#1F60C4", "green":"#37872D", "yellow":"#E0B400", "orange":"#FA6400", "purple":"#440563", "baby blue":"#8AB8FF", "grey":"#757575"}
 
+#panel templates are resolved relative to this package, not the current working directory
+templateDirectory = os.path.dirname(os.path.abspath(__file__))
+_templates = {}
+
+def registerTemplate(name, template):
+    """
+    Parameters: name of the template, and either a dictionary or a path to a json file
+    Description: registers a panel template under name. Templates are loaded once and copied
+        for every panel built from them, so registering a name that already exists replaces it.
+        Relative paths are resolved against the grafapy package directory.
+    """
+    if isinstance(template, dict):
+        _templates[name] = _copyTemplate(template)
+    else:
+        _templates[name] = _loadTemplate(template)
+
+def getTemplate(name):
+    """
+    Parameters: name of a registered template, or the file name of a template shipped with grafapy
+    Returns: an independent copy of the template's dictionary, safe to modify
+    """
+    if name not in _templates:
+        _templates[name] = _loadTemplate(name)
+    return _copyTemplate(_templates[name])
+
+def _loadTemplate(filename):
+    """read a template json file (relative to the package directory), return as dict"""
+    if not os.path.isabs(filename):
+        filename = os.path.join(templateDirectory, filename)
+    with open(filename) as jPanel:
+        return json.load(jPanel)
+
+def _copyTemplate(value):
+    """
+    Parameters: json-compatible value (dict, list, or scalar)
+    Returns: a copy sharing no dicts or lists with value. Much cheaper than copy.deepcopy, since
+        templates only ever contain plain json types.
+    """
+    if isinstance(value, dict):
+        return {key: _copyTemplate(v) for key, v in value.items()}
+    if isinstance(value, list):
+        return [_copyTemplate(v) for v in value]
+    return value
+
+def _buildTarget(query):
+    """
+    Parameters: a Query
+    Returns: the grafana-zabbix target dictionary for query. Every target gets its own dicts, so
+        changing one target never changes another panel's.
+    """
+    alias = query.getAlias()
+    if alias==None:
+        alias = query.getItem()
+    if query.getApplication()!=None:
+        application = {"filter": query.getApplication()}
+    else:
+        application = {"filter": ""}
+    mode = query.getMode()
+    if mode==None:
+        mode = 0
+    return {"application": application,
+            "functions": [{
+                "added": False,
+                "def": {
+                    "category": "Alias",
+                    "defaultParams": [],
+                    "name": "setAlias",
+                    "params": [{
+                        "name": "alias",
+                        "type": "string"
+                        }]
+                    },
+                "params": [alias],
+                "text": "setAlias(" + alias + ")"
+                }],
+            "group": {"filter": query.getGroup()},
+            "host": {"filter": query.getHost()},
+            "item": {"filter": query.getItem()},
+            "mode": mode,
+            "options": {"showDisabledItems": False, "skipEmptyValues": False},
+            "refId": "A",
+            "resultFormat": "time_series",
+            "table": {"skipEmptyValues": False}}
+
 class Panel:
     def __init__(self, panelType, title="title", queryArray=None, JSON=None, absLink=None):
         """
         Parameters: panelType (required), optional title and queryArray. If json found,
-            initializes panel from json data instead of other arguments.
+            initializes panel from json data instead of other arguments. JSON may be a json string
+            or an already parsed dictionary; a dictionary is used as is, not copied.
             NOTE: This constructor should not be called directly. Initialize your panels from one of the supported panel type constructors.
         """
         if JSON!=None:
-            print("Initializing panel from json...")
-            self.dictionary = json.loads(JSON)
+            logger.debug("Initializing panel from json...")
+            if isinstance(JSON, dict):
+                self.dictionary = JSON
+            else:
+                self.dictionary = serializer.loads(JSON)
             self.title = self.dictionary["title"]
             self.type = self.dictionary["type"]
             #throw exception if panelType != self.type
-            self.queries=[]
-            for target in self.dictionary["targets"]:
-                host = target["host"]["filter"]
-                group = target["group"]["filter"]
-                item = target["item"]["filter"]
-                application = target["application"]["filter"]
-                q = Query(host, item, group=group, application=application)
-                self.queries.append(q)
+            #queries are built from the targets the first time they are needed
+            self._queries = None
+            self._watchers = {}
+            self._pendingQueries = []
+            self.queryPlan = None
+            self.queryOptions = {}
             h = self.dictionary["gridPos"]["h"]
             w = self.dictionary["gridPos"]["w"]
             x = self.dictionary["gridPos"]["x"]
@@ -44,11 +140,14 @@ class Panel:
             self.size = [h, w]
             self.sizeSet = False
         if JSON==None:
-            print("Initializing panel from arguments...")
+            logger.debug("Initializing panel '%s' from arguments...", title)
             self.title = title
-            print(".....", self.title)
             self.type = panelType
-            self.queries = []
+            self._queries = []
+            self._watchers = {}
+            self._pendingQueries = []
+            self.queryPlan = None
+            self.queryOptions = {}
             self.dictionary = {}
             self.id = 0
             self.position = [0, 0]
@@ -61,18 +160,59 @@ class Panel:
             if queryArray!=None:
                 self.queries.extend(queryArray)
 
+    @property
+    def queries(self):
+        """
+        Returns: list of this panel's queries. For panels imported from json the list is built
+            from the panel's targets on first access.
+        """
+        if self._queries==None:
+            self._queries = self._queriesFromTargets()
+        return self._queries
+
+    @queries.setter
+    def queries(self, queryList):
+        self._queries = queryList
+        self._queriesChanged()
+
+    def _queriesChanged(self):
+        """
+        Description: private method that marks this panel's queries as changed in the index of every
+            dashboard holding it (see DashBoard._getIndex), so they index it again
+        """
+        for changed in self._watchers.values():
+            changed.add(self)
+
+    def _queriesFromTargets(self):
+        """
+        Returns: list of Query objects built from this panel dictionary's targets, with the alias of
+            each target's setAlias function (unless it is the item name) and its mode
+        """
+        queryList = []
+        for target in self.dictionary.get("targets", []):
+            host = target["host"]["filter"]
+            group = target["group"]["filter"]
+            item = target["item"]["filter"]
+            application = target["application"]["filter"]
+            alias = None
+            for function in target.get("functions", []):
+                if function.get("def", {}).get("name")=="setAlias" and function.get("params"):
+                    alias = function["params"][0]
+            if alias==item:
+                alias = None
+            mode = target.get("mode") or None
+            queryList.append(Query(host, item, group=group, application=application, mode=mode, alias=alias))
+        return queryList
+
     def _readJSON(self, filename):
-        """read json from file, return as dict"""
-        jPanel = open(filename)
-        panelStr = jPanel.read()
-        jPanel.close()
-        d = json.loads(panelStr)
-        return d
+        """return a fresh copy of the named panel template as a dict (see getTemplate)"""
+        return getTemplate(filename)
     
     def getDictionary(self):
         """
-        Returns: panel's dictionary (python, not json)
+        Returns: panel's dictionary (python, not json), with targets for all of its queries
         """
+        self._buildTargets()
         return self.dictionary
 
     def getType(self):
@@ -127,22 +267,46 @@ class Panel:
         """
         return self.size
 
+    def setSize(self, h, w):
+        """
+        Parameters: height and width (in grafana grid units, the dashboard is 24 wide)
+        Description: gives this panel its own size instead of the dashboard's default. Call before
+            adding the panel to a dashboard.
+        """
+        self.size = [h, w]
+        self.dictionary["gridPos"]["h"] = h
+        self.dictionary["gridPos"]["w"] = w
+        self.sizeSet = True
+
     def _setSize(self, h, w):
         """
         Parameters: height and width
+        Description: gives the panel the dashboard's default size. Unlike setSize, the panel still
+            counts as default sized (see _sizeSet), so it is sized again whenever it is laid out.
         """
         if not(self.sizeSet):
             self.size = [h, w]
             self.dictionary["gridPos"]["h"] = h
             self.dictionary["gridPos"]["w"] = w
-            self.sizeSet = True
         else:
-            print("The size on this panel has already been set.")
-            print("Height: %s, Width: %s" % (self.size[0], self.size[1]))
+            logger.warning("The size on panel '%s' has already been set. Height: %s, Width: %s",
+                    self.title, self.size[0], self.size[1])
+
+    def setQueryOptions(self, **options):
+        """
+        Parameters: any of maxDataPoints, interval (e.g. "5m") and cacheTimeout (e.g. "60")
+        Description: sets this panel's query options. They win over the dashboard's defaults and
+            overrides (see tuning.py), which are applied when the panel is added to a dashboard.
+        """
+        for name, value in options.items():
+            if name not in tuning.queryOptionNames:
+                raise Exception("Unknown query option '%s', use one of %s" % (name, ", ".join(tuning.queryOptionNames)))
+            self.queryOptions[name] = value
+            self.dictionary[name] = value
 
     def _sizeSet(self):
         """
-        Returns: bool indicating whether the size has been set on this panel.
+        Returns: bool indicating whether the size has been set on this panel with setSize.
         """
         return self.sizeSet
 
@@ -169,45 +333,96 @@ class Panel:
     def addQueries(self, queryList):                                              
         """
         Parameters: list of query objects to be added to this panel
-        """
-        for query in queryList:
-            #Throw exceptions when someone gives something that's not a query object
-            targetDict = {}
-            if query.getApplication()!=None:
-                targetDict["application"] = {"filter": query.getApplication()}
-            else:
-                targetDict["application"] = {"filter": ""}
-            targetDict["functions"] = [{
-                "added": False,
-                "def": {
-                    "category": "Alias",
-                    "defaultParams": [],
-                    "name": "setAlias",
-                    "params": [{
-                        "name": "alias",
-                        "type": "string"
-                        }]
-                    },
-                "params": [query.getItem()],
-                "text": "setAlias(" + query.getItem() + ")"
-                }]
-            print("about to check if there is an alias...")
-            if query.getAlias()!=None:
-                print("found an alias!")
-                print("Alias: %s" % query.getAlias())
-                targetDict["functions"][0]["params"] = [query.getAlias()]
-                targetDict["functions"][0]["text"] = "setAlias(" + query.getAlias() + ")"
-            targetDict["group"] = {"filter": query.getGroup()}
-            targetDict["host"] = {"filter": query.getHost()}
-            targetDict["item"] = {"filter": query.getItem()}
-            targetDict["mode"] = 0
-            targetDict["options"] = {"showDisabledItems": False, "skipEmptyValues": False}
-            targetDict["refId"] = "A"
-            targetDict["resultFormat"] = "time_series"
-            targetDict["table"] = {"skipEmptyValues": False}
-            if query.getMode()!=None:
-                targetDict["mode"] = query.getMode()
-            self.dictionary["targets"].append(targetDict)
+        Description: the queries' targets are built the next time the panel's dictionary is needed
+            (see getDictionary), not when they are added.
+        """
+        queryList = list(queryList)
+        self.queries.extend(queryList)
+        self._pendingQueries.extend(queryList)
+        self._queriesChanged()
+
+    def clone(self, title=None, queryArray=None, absLink=None, **fields):
+        """
+        Parameters: optional title, queryArray and absLink, as in the panel constructors, and any
+            top level keys of the panel's dictionary to replace (e.g. thresholds=[...], math="a*b").
+            Without queryArray or targets, the clone gets copies of this panel's targets (and keeps
+            its query plan, see planner.py). With a queryArray, targets are built from the new
+            queries, and a coalesced panel's original math is restored for them.
+        Returns: a copy of this panel with only the given fields changed
+        Description: much faster than building the panel again. The copy's dictionary is a new top
+            level dictionary that shares every value it does not change with this panel (copy on
+            write), so replace a clone's nested values instead of modifying them in place. Its
+            position, size and list of targets are its own, but each target is a shallow copy of
+            this panel's, sharing its nested dicts (host, item, options, ...).
+        """
+        clone = object.__new__(type(self))
+        clone.__dict__.update(self.__dict__)
+        dictionary = dict(self.dictionary)
+        dictionary["gridPos"] = dict(self.dictionary["gridPos"])
+        clone.dictionary = dictionary
+        clone.position = list(self.position)
+        clone.size = list(self.size)
+        clone.queryOptions = dict(self.queryOptions)
+        clone._watchers = {}
+        clone._queries = list(self.queries if queryArray==None else queryArray)
+        clone._pendingQueries = []
+        if queryArray==None and "targets" not in fields:
+            #the built targets keep what the queries cannot hold, such as a json panel's aliases
+            self._buildTargets()
+            dictionary["targets"] = [dict(target) for target in self.dictionary["targets"]]
+        else:
+            dictionary["targets"] = []
+            clone.queryPlan = None
+            if self.queryPlan!=None and self.queryPlan.originalMath!=None:
+                dictionary["math"] = self.queryPlan.originalMath
+            if "targets" not in fields:
+                clone._pendingQueries = list(clone.queries)
+        if title!=None:
+            clone.title = title
+            dictionary["title"] = title
+        if absLink!=None:
+            clone.links = [{"title":"Click to go", "type":"absolute", "url":absLink}]
+            dictionary["links"] = clone.links
+        dictionary.update(fields)
+        instrument.count("panels_cloned")
+        return clone
+
+    def with_host(self, host):
+        """
+        Parameters: host name
+        Returns: a clone (see clone) of this panel for another host. The prototype's host name is
+            replaced in its queries, title and links.
+            Example: panels = [prototype.with_host(host) for host in hosts]
+        """
+        hosts = set(query.getHost() for query in self.queries)
+        if len(hosts)!=1:
+            raise Exception("with_host needs a panel whose queries are all for one host, '%s' has %s" % (self.title, len(hosts)))
+        old = hosts.pop()
+        queries = [query.replace(host=host) for query in self.queries]
+        fields = {}
+        self._buildTargets()
+        if self.queryPlan==None and len(self.dictionary["targets"])==len(queries):
+            #the targets only differ in their host filter, the rest of each target is shared
+            hostFilter = {"filter": host}
+            fields["targets"] = [dict(target, host=hostFilter) for target in self.dictionary["targets"]]
+        if self.dictionary.get("links"):
+            fields["links"] = _replaceName(self.dictionary["links"], old, host)
+        clone = self.clone(title=_replaceName(self.title, old, host), queryArray=queries, **fields)
+        if "links" in fields:
+            clone.links = fields["links"]
+        return clone
+
+    def _buildTargets(self):
+        """
+        Description: appends a target to this panel's dictionary for every query added since the
+            last call
+        """
+        if self._pendingQueries:
+            targets = self.dictionary["targets"]
+            for query in self._pendingQueries:
+                #Throw exceptions when someone gives something that's not a query object
+                targets.append(_buildTarget(query))
+            self._pendingQueries = []
 
 class SingleStatPanel(Panel):
 
@@ -242,14 +457,11 @@ class SingleStatPanel(Panel):
                 Example: absLink=<another dashboard's URL>
             See singleStat panel examples for details.
         """
-#        print("ssp title: ", title)
-#        print("ssp units: ", units)
-#        print("ssp sparkline: ", sparkline)
-#        print("ssp JSON: ", JSON)
-#        print("ssp fs: ", fontSize)
         Panel.__init__(self, "singlestat", title=title, queryArray=queryArray, JSON=JSON, absLink=absLink)
         if JSON==None:
-            self._buildDictionary(valueMaps, rangeMaps, fontSize, prefix, postfix, colors, thresholds, units, decimals, sparkline, colorValue, colorBackground)
+            with instrument.timed("panel_build"):
+                self._buildDictionary(valueMaps, rangeMaps, fontSize, prefix, postfix, colors, thresholds, units, decimals, sparkline, colorValue, colorBackground)
+            instrument.count("panels_built")
 
     def _buildDictionary(self, valueMaps, rangeMaps, fontSize, prefix, postfix, colors, thresholds, units, decimals, sparkline, colorValue, colorBackground):
         """
@@ -260,10 +472,8 @@ class SingleStatPanel(Panel):
         singleStatDictionary["valueFontSize"] = fontSize
         if self.links!=None:
             singleStatDictionary["links"] = self.links
-        print(sparkline, type(sparkline))
         if sparkline:
             singleStatDictionary["sparkline"]["show"] = True
-        print(units, type(units))
         if units!=None:
             singleStatDictionary["format"]=units
         if decimals!=None:
@@ -297,8 +507,7 @@ class SingleStatPanel(Panel):
         else:
             singleStatDictionary["colorValue"] = False
         self.dictionary = singleStatDictionary             
-        if self.queries!=None:                        
-            self.addQueries(self.queries)
+        self._pendingQueries = list(self.queries)
         self.id = 0
         self.position = [0,0]
     
@@ -358,12 +567,11 @@ class MathStatPanel(SingleStatPanel):
         thresholdMap = []
         if len(colors)<len(thresholds):
             #raise exception, not enough colors!
-            print("You done goofed!")
+            logger.warning("Not enough colors (%s) for thresholds '%s', thresholds ignored.", len(colors), ",".join(thresholds))
         else:
             for i in range(len(thresholdList)):
                 oneMapping = {"color":colorDictionary[colors[i]], "value":thresholdList[i]}
                 thresholdMap.append(oneMapping)
-                print("Threshold Map: %s" % (thresholdMap))
             return thresholdMap
 
 class GraphPanel(Panel):
@@ -376,7 +584,9 @@ class GraphPanel(Panel):
         """
         Panel.__init__(self, "graph", title=title, queryArray=queryArray, JSON=JSON, absLink=absLink)
         if JSON==None:
-            self._buildDictionary(yAxesLeftMinMax, units)
+            with instrument.timed("panel_build"):
+                self._buildDictionary(yAxesLeftMinMax, units)
+            instrument.count("panels_built")
 
     def _buildDictionary(self, yAxesLeftMinMax, units):
         """
@@ -395,12 +605,95 @@ class GraphPanel(Panel):
             graphDictionary["yaxes"][0]["max"] = yAxesLeftMinMax[1]
                             
         self.dictionary = graphDictionary
-        if self.queries!=None:
-            self.addQueries(self.queries)
+        self._pendingQueries = list(self.queries)
         self.id = 0
         self.position = [0,0]
 
+_namePatterns = {}
+
+def _replaceName(value, name, replacement):
+    """
+    Returns: a copy of value (a panel dictionary, or any part of one) with every whole word
+        occurrence of name in its strings replaced
+    """
+    if isinstance(value, str):
+        if name not in value:
+            return value
+        pattern = _namePatterns.get(name)
+        if pattern==None:
+            pattern = re.compile(r"(?<![\w.-])%s(?![\w.-])" % re.escape(name))
+            if len(_namePatterns) > 1000:
+                _namePatterns.clear()
+            _namePatterns[name] = pattern
+        return pattern.sub(lambda match: replacement, value)
+    if isinstance(value, dict):
+        return {key: _replaceName(v, name, replacement) for key, v in value.items()}
+    if isinstance(value, list):
+        return [_replaceName(v, name, replacement) for v in value]
+    return value
+
+class RepeatedPanel(Panel):
+
+    def __init__(self, panel, hosts, variable="host", maxPerRow=None, host=None):
+        """
+        Parameters: a prototype panel, the hosts to repeat it for, the name of the template variable
+            holding them, and the most copies grafana puts in one row (the dashboard's panelsPerRow
+            by default). The prototype's queries, title and links use "$<variable>" wherever a host
+            name goes, or, if host is given, are written for that host and it is replaced.
+            Example: RepeatedPanel(GraphPanel(title="$host load", queryArray=[Query("$host", "Processor load")]), hosts)
+        Description: a single panel in the dashboard json that grafana draws once per host, side by
+            side. DashBoard.addPanels adds the template variable to the dashboard. The panel always
+            spans the full width of the dashboard, grafana sizes the copies from maxPerRow.
+            removePanelsByHost removes a host from the panel and its variable, and the panel once
+            it has no hosts left.
+        """
+        dictionary = _copyTemplate(panel.getDictionary())
+        queries = list(panel.getQueries())
+        if host!=None:
+            dictionary = _replaceName(dictionary, host, "$" + variable)
+            queries = [query.replace(host="$" + variable) if query.getHost()==host else query for query in queries]
+        Panel.__init__(self, panel.getType(), JSON=dictionary)
+        self.type = panel.getType()
+        self.title = self.dictionary["title"]
+        self._queries = queries
+        self.queryOptions = dict(panel.queryOptions)
+        if panel._sizeSet():
+            self.setSize(panel.getSize()[0], gridColumns)
+        self.hosts = list(hosts)
+        self.variable = variable
+        self.dictionary["repeat"] = variable
+        self.dictionary["repeatDirection"] = "h"
+        if maxPerRow!=None:
+            self.dictionary["maxPerRow"] = maxPerRow
+
+    def containsHost(self, hostName):
+        """
+        Returns: bool, true if hostName is one of the hosts this panel is repeated for
+        """
+        return hostName in self.hosts
+
+    def templateVariable(self):
+        """
+        Returns: the grafana custom template variable listing this panel's hosts, all selected
+        """
+        options = [{"selected": True, "text": "All", "value": "$__all"}]
+        for host in self.hosts:
+            options.append({"selected": False, "text": host, "value": host})
+        return {"name": self.variable, "label": None, "type": "custom", "hide": 0,
+                "query": ",".join(host.replace(",", "\\,") for host in self.hosts),
+                "multi": True, "includeAll": True, "allValue": None, "skipUrlSync": False,
+                "current": {"selected": True, "text": "All", "value": ["$__all"]}, "options": options}
+
+def _intern(value):
+    """
+    Returns: value, interned if it is a string so equal strings share one object
+    """
+    if type(value) is str:
+        return sys.intern(value)
+    return value
+
 class Query:
+    __slots__ = ("host", "item", "group", "application", "mode", "alias")
 
     def __init__(self, host, item, group="/.*/", application=None, mode=None, alias=None):
         """
@@ -410,13 +703,52 @@ class Query:
             mode: number corresponding to the type of data displayed in your query. 
                 Example: mode=0 (for metric queries)
                          mode=2 (for text queries)
+            Queries are immutable and hashable, and their strings are interned, so the same host or
+            item name is stored once no matter how many queries use it. Use replace() to get a
+            modified copy.
         """
-        self.host = host
-        self.item = item
-        self.group = group
-        self.application = application
-        self.mode = mode
-        self.alias = alias
+        setField = object.__setattr__
+        setField(self, "host", _intern(host))
+        setField(self, "item", _intern(item))
+        setField(self, "group", _intern(group))
+        setField(self, "application", _intern(application))
+        setField(self, "mode", mode)
+        setField(self, "alias", _intern(alias))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Query objects are immutable, use replace() to change '%s'" % name)
+
+    def __delattr__(self, name):
+        raise AttributeError("Query objects are immutable")
+
+    def _fields(self):
+        """
+        Returns: tuple of this query's fields, in constructor order
+        """
+        return (self.host, self.item, self.group, self.application, self.mode, self.alias)
+
+    def __eq__(self, other):
+        if not isinstance(other, Query):
+            return NotImplemented
+        return self._fields()==other._fields()
+
+    def __hash__(self):
+        return hash(self._fields())
+
+    def __reduce__(self):
+        return (Query, self._fields())
+
+    def __repr__(self):
+        return "Query(%r, %r, group=%r, application=%r, mode=%r, alias=%r)" % self._fields()
+
+    def replace(self, **changes):
+        """
+        Parameters: any of host, item, group, application, mode and alias
+        Returns: a new query with the given fields changed
+        """
+        fields = dict(zip(Query.__slots__, self._fields()))
+        fields.update(changes)
+        return Query(**fields)
 
     def getHost(self):
         """
@@ -453,3 +785,55 @@ class Query:
         Returns: alias for this query
         """
         return self.alias
+
+class QueryTable:
+
+    def __init__(self, hosts, items, group="/.*/", application=None, mode=None, alias=None):
+        """
+        Parameters: list of host names and list of item names. The table holds one query for every
+            host and item pair, stored as two columns rather than as separate Query objects.
+            group, application and mode: shared by every query, see Query
+            alias: None, "host" or "item", to alias each query with its host or item name
+        Iterating over the table yields the queries host by host, so a table can be given anywhere
+            a list of queries is accepted:
+            Example: GraphPanel(title="CPU", queryArray=QueryTable(hosts, ["Processor load"]))
+        """
+        if alias not in (None, "host", "item"):
+            raise Exception("QueryTable alias must be None, 'host' or 'item', not '%s'" % alias)
+        self.hosts = tuple(_intern(host) for host in hosts)
+        self.items = tuple(_intern(item) for item in items)
+        self.group = _intern(group)
+        self.application = _intern(application)
+        self.mode = mode
+        self.alias = alias
+
+    def __len__(self):
+        return len(self.hosts) * len(self.items)
+
+    def __iter__(self):
+        for host in self.hosts:
+            for item in self.items:
+                yield self._query(host, item)
+
+    def _query(self, host, item):
+        """
+        Returns: the Query for one host and item of this table
+        """
+        alias = None
+        if self.alias=="host":
+            alias = host
+        elif self.alias=="item":
+            alias = item
+        return Query(host, item, group=self.group, application=self.application, mode=self.mode, alias=alias)
+
+    def forHost(self, host):
+        """
+        Returns: list of this table's queries for one host
+        """
+        return [self._query(_intern(host), item) for item in self.items]
+
+    def forItem(self, item):
+        """
+        Returns: list of this table's queries for one item
+        """
+        return [self._query(host, _intern(item)) for host in self.hosts]
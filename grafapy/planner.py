@@ -0,0 +1,244 @@
+"""
+Query planner: merges a panel's zabbix targets into fewer targets.
+
+A panel with one query per host (or per item) sends one request to the zabbix datasource per
+target on every refresh. Queries that differ only in their host are merged into a single target
+whose host filter is a regex, /^(a|b|c)$/, and likewise for queries that differ only in their
+item. Queries are only merged when that gives the same result:
+
+ - In a MathStatPanel's math expression, queries whose aliases are whole terms of a sum, and
+   appear nowhere else, are merged, their series added up in zabbix's datasource with an
+   aggregate function (sumSeries by default), and the sum is rewritten to the merged target's
+   alias:
+
+    math "h1+h2+h3", 3 targets   ->   math "sum1", 1 target: host /^(h1|h2|h3)$/, sumSeries()
+
+ - In panels without math, only queries without an alias are merged, and their series are not
+   added up, so a graph still shows one series per host (or item).
+
+The plan keeps the original queries and math, see QueryPlan.uncoalescedTargets and uncoalesce.
+"""
+
+import re
+from panel import _buildTarget
+
+_aggregateFunctionDefs = {}
+
+def _aggregateFunction(name):
+    """
+    Returns: the grafana-zabbix function dictionary for an aggregate function without parameters,
+        such as sumSeries, avgSeries or maxSeries
+    """
+    if name not in _aggregateFunctionDefs:
+        _aggregateFunctionDefs[name] = {"category": "Aggregate", "defaultParams": [], "name": name, "params": []}
+    return {"added": False, "def": _aggregateFunctionDefs[name], "params": [], "text": name + "()"}
+
+def _isRegex(value):
+    """
+    Returns: bool, true if value is a grafana-zabbix regex filter rather than a name
+    """
+    return value.startswith("/") and value.endswith("/") and len(value) > 1
+
+def _regexFilter(names):
+    """
+    Returns: a grafana-zabbix filter matching exactly the given names
+    """
+    return "/^(%s)$/" % "|".join(re.escape(name) for name in names)
+
+def _splitSum(math):
+    """
+    Returns: list of the terms of math's outermost sum, stripped of whitespace
+    """
+    terms = [""]
+    depth = 0
+    for char in math:
+        if char=="(":
+            depth += 1
+        elif char==")":
+            depth -= 1
+        if char=="+" and depth==0:
+            terms.append("")
+        else:
+            terms[-1] += char
+    return [term.strip() for term in terms]
+
+def _rewriteSum(math, aliases, newAlias):
+    """
+    Returns: math with the sum of aliases replaced by newAlias, or None if aliases are not all
+        whole terms of math's outermost sum (each used exactly once)
+    """
+    names = re.findall(r"[A-Za-z_][A-Za-z0-9_]*", math)
+    for alias in aliases:
+        if names.count(alias)!=1:
+            return None
+    terms = _splitSum(math)
+    if any(term=="" for term in terms) or not set(aliases).issubset(terms):
+        return None
+    rewritten = []
+    for term in terms:
+        if term not in aliases:
+            rewritten.append(term)
+        elif term==aliases[0]:
+            rewritten.append(newAlias)
+    return "+".join(rewritten)
+
+class QueryPlan:
+    def __init__(self, queries, math, targets, plannedMath, merged, originalTargets=None):
+        """
+        Parameters: the original queries and math, the planned targets and math, merged, a list
+            of (index of a merged target, the queries it replaces), and the original targets, if
+            they were given to planQueries
+            NOTE: QueryPlans are built by planQueries, this constructor should not be called directly.
+        """
+        self.queries = queries
+        self.originalTargets = originalTargets
+        self.originalMath = math
+        self.targets = targets
+        self.math = plannedMath
+        self.merged = merged
+
+    def uncoalescedTargets(self):
+        """
+        Returns: the targets the queries have without planning, one per query
+        """
+        if self.originalTargets!=None:
+            return list(self.originalTargets)
+        return [_buildTarget(query) for query in self.queries]
+
+    def __str__(self):
+        """
+        Returns: a one line summary, for example "200 queries -> 2 targets (2 merged)"
+        """
+        return "%s queries -> %s targets (%s merged)" % (len(self.queries), len(self.targets), len(self.merged))
+
+def _targetAlias(query):
+    """
+    Returns: the alias query's target is given, its alias or else its item name
+    """
+    if query.getAlias()!=None:
+        return query.getAlias()
+    return query.getItem()
+
+def _newAlias(math, used, number):
+    """
+    Returns: an alias for a merged target, "sum<number>" unless that name is already taken
+    """
+    names = set(re.findall(r"[A-Za-z_][A-Za-z0-9_]*", math or "")) | used
+    alias = "sum%s" % number
+    while alias in names:
+        number += 1
+        alias = "sum%s" % number
+    return alias
+
+def planQueries(queries, math=None, aggregate="sumSeries", targets=None):
+    """
+    Parameters: list of queries, the math expression using their aliases (MathStatPanel), and the
+        zabbix aggregate function that adds up the series merged for a sum in math, or None to
+        leave panels with math as they are. Without math, queries without an alias are merged
+        whatever aggregate is, and never added up. targets, the queries' current targets (one per
+        query), are kept as they are for the queries that are not merged.
+    Returns: a QueryPlan
+    Description: queries that differ only in their host are merged first, then queries left on
+        their own that differ only in their item. Targets stay in the order of their first query.
+    """
+    queries = list(queries)
+    if targets!=None and len(targets)!=len(queries):
+        targets = None
+    slots = [[query] for query in queries]
+    sources = list(range(len(queries)))
+    plannedMath = math
+    merged = []
+    used = set(_targetAlias(query) for query in queries)
+
+    for field, other in (("host", "item"), ("item", "host")):
+        candidates = {}
+        order = []
+        for i, slot in enumerate(slots):
+            query = slot[0] if len(slot)==1 else None
+            if query==None or _isRegex(getattr(query, field)):
+                continue
+            key = (getattr(query, other), query.getGroup(), query.getApplication(), query.getMode())
+            if key not in candidates:
+                candidates[key] = []
+                order.append(key)
+            candidates[key].append(i)
+
+        for key in order:
+            indexes = candidates[key]
+            group = [slots[i][0] for i in indexes]
+            if len(set(getattr(query, field) for query in group)) < 2:
+                continue
+            if math==None:
+                if any(query.getAlias()!=None for query in group):
+                    continue
+                alias = None
+            else:
+                if aggregate==None:
+                    continue
+                alias = _newAlias(plannedMath, used, 1)
+                rewritten = _rewriteSum(plannedMath, [_targetAlias(query) for query in group], alias)
+                if rewritten==None:
+                    continue
+                plannedMath = rewritten
+                used.add(alias)
+            names = []
+            for query in group:
+                if getattr(query, field) not in names:
+                    names.append(getattr(query, field))
+            mergedQuery = group[0].replace(alias=alias, **{field: _regexFilter(names)})
+            slots[indexes[0]] = [mergedQuery] + group
+            for i in indexes[1:]:
+                slots[i] = None
+        sources = [source for slot, source in zip(slots, sources) if slot!=None]
+        slots = [slot for slot in slots if slot!=None]
+
+    planned = []
+    for slot, source in zip(slots, sources):
+        if len(slot)==1 and targets!=None:
+            planned.append(targets[source])
+            continue
+        target = _buildTarget(slot[0])
+        if len(slot) > 1:
+            #only merges for a sum in math have an alias, and only they are added up
+            if slot[0].getAlias()==None:
+                target["functions"] = []
+            else:
+                target["functions"] = [_aggregateFunction(aggregate)] + target["functions"]
+            merged.append((len(planned), slot[1:]))
+        planned.append(target)
+    return QueryPlan(queries, math, planned, plannedMath, merged, None if targets==None else list(targets))
+
+def coalesce(panel, aggregate="sumSeries"):
+    """
+    Parameters: a panel, and the aggregate function (see planQueries)
+    Returns: the QueryPlan, also kept as panel.queryPlan
+    Description: replaces the panel's targets (and math, for a MathStatPanel) with the planned
+        ones. The panel's queries are not changed, so containsHost and containsItem still work.
+        Call after all of the panel's queries have been added. Targets that are not merged are kept
+        as they are, and a panel with nothing to merge is left untouched (its queryPlan stays None).
+    """
+    if panel.queryPlan!=None:
+        uncoalesce(panel)
+    dictionary = panel.getDictionary()
+    plan = planQueries(panel.getQueries(), dictionary.get("math"), aggregate, dictionary.get("targets"))
+    if not plan.merged:
+        return plan
+    dictionary["targets"] = plan.targets
+    if plan.math!=None:
+        dictionary["math"] = plan.math
+    panel.queryPlan = plan
+    return plan
+
+def uncoalesce(panel):
+    """
+    Parameters: a panel planned with coalesce
+    Description: gives the panel back its original targets and math
+    """
+    plan = panel.queryPlan
+    if plan==None:
+        return
+    dictionary = panel.getDictionary()
+    dictionary["targets"] = plan.uncoalescedTargets() + dictionary["targets"][len(plan.targets):]
+    if plan.originalMath!=None:
+        dictionary["math"] = plan.originalMath
+    panel.queryPlan = None
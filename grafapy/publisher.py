@@ -0,0 +1,123 @@
+"""
+Bulk publishing for grafapy dashboards. push_many shares one pooled requests.Session
+between a pool of worker threads, so a fleet of dashboards is pushed concurrently over
+kept-alive connections instead of one fresh connection per dashboard.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+import instrument
+
+class PushResult:
+    def __init__(self, dashboard, status=None, latency=None, error=None, response=None, skipped=False, key=None, digest=None):
+        """
+        Parameters: the dashboard that was pushed, http status code (None if no response was
+            received), latency in seconds, error (exception or message, None on success), the raw
+            response, whether the push was skipped because the dashboard was unchanged, and the
+            dashboard's push state key and content hash, if they were worked out.
+        """
+        self.dashboard = dashboard
+        self.title = dashboard.title
+        self.key = key
+        self.digest = digest
+        self.status = status
+        self.latency = latency
+        self.error = error
+        self.response = response
+        self.skipped = skipped
+
+    def succeeded(self):
+        """
+        Returns: bool, true if grafana accepted the dashboard or it was skipped as unchanged
+        """
+        return self.error==None and (self.skipped or self.status==200)
+
+    def __str__(self):
+        """
+        Returns: one line summary of this result
+        """
+        if self.skipped:
+            return "%s: unchanged, skipped" % self.title
+        latency = "-" if self.latency==None else "%.3fs" % self.latency
+        resultString = "%s: status %s in %s" % (self.title, self.status, latency)
+        if self.error!=None:
+            resultString += " (%s)" % self.error
+        return resultString
+
+def createSession(poolSize=10):
+    """
+    Parameters: number of connections to keep open per host
+    Returns: a requests.Session with a connection pool large enough for poolSize workers
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def pushDashboard(dashboard, postURL, session, compress=False, unchanged=None):
+    """
+    Parameters: a dashboard, the url to post it to, a requests.Session, compress, to gzip the
+        request body, and an optional function of (state key, content hash) that returns True if
+        the dashboard is unchanged since its last push
+    Returns: a PushResult, with the dashboard's key and hash set if unchanged was given
+    Description: a failed push is recorded in the result instead of being raised. Nothing is
+        counted or recorded in a PushState, that is left to the caller (see push_many).
+    """
+    key, digest = None, None
+    if unchanged!=None:
+        key = dashboard._stateKey()
+        digest = dashboard.contentHash()
+        if unchanged(key, digest):
+            return PushResult(dashboard, skipped=True, key=key, digest=digest)
+    start = time.perf_counter()
+    try:
+        response = dashboard._post(postURL, session, compress)
+    except Exception as e:
+        return PushResult(dashboard, latency=time.perf_counter()-start, error=e, key=key, digest=digest)
+    latency = time.perf_counter() - start
+    error = None
+    if response.status_code!=200:
+        error = "DashBoard could not be posted. Status code: %s" % response.status_code
+    return PushResult(dashboard, response.status_code, latency, error, response, key=key, digest=digest)
+
+def push_many(dashboards, postURL=None, max_workers=8, session=None, state=None, compress=False):
+    """
+    Parameters: list of dashboards, optional postURL (each dashboard's own url is used if not set),
+        number of concurrent workers, an optional requests.Session to reuse, and an optional
+        PushState used to skip dashboards that have not changed since their last push. If no
+        session is given one is created for this batch and closed afterwards. Set compress=True
+        to gzip request bodies.
+    Returns: list of PushResult objects, in the same order as dashboards
+    Description: pushes every dashboard concurrently over a shared connection pool. A failed push
+        is recorded in its result instead of being raised, so one bad dashboard never aborts the
+        rest of the batch.
+    """
+    dashboards = list(dashboards)
+    ownSession = session==None
+    if ownSession:
+        session = createSession(max_workers)
+
+    def pushOne(dashboard):
+        result = pushDashboard(dashboard, postURL if postURL!=None else dashboard.URL, session, compress,
+                               state.isUnchanged if state!=None else None)
+        if result.skipped:
+            state.markSkipped()
+            instrument.count("pushes_skipped")
+        elif result.error!=None:
+            instrument.count("push_errors")
+        elif state!=None:
+            state.record(result.key, result.digest)
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(pushOne, dashboards))
+    finally:
+        if ownSession:
+            session.close()
+        if state!=None:
+            state.save()
+    return results
@@ -0,0 +1,72 @@
+"""
+Local record of what was last pushed to grafana, so unchanged dashboards can be skipped.
+
+    state = PushState("~/.grafapy/pushstate.json")
+    for d in dashboards:
+        d.push(state=state)
+    print(state.summary())
+"""
+
+import json
+import os
+import threading
+
+class PushState:
+    def __init__(self, path=None):
+        """
+        Parameters: optional path of a json file to keep hashes in between runs. If no path is
+            given, hashes are only remembered for the lifetime of this object.
+        """
+        self.path = None
+        if path!=None:
+            self.path = os.path.expanduser(path)
+        self.hashes = {}
+        self.pushed = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+        if self.path!=None and os.path.exists(self.path):
+            with open(self.path) as stateFile:
+                self.hashes = json.load(stateFile)
+
+    def isUnchanged(self, key, digest):
+        """
+        Parameters: dashboard key (uid or title) and its current content hash
+        Returns: bool, true if digest matches the hash recorded at the last successful push
+        """
+        return self.hashes.get(key)==digest
+
+    def markSkipped(self):
+        """
+        Description: counts a push that was skipped because the dashboard had not changed
+        """
+        with self.lock:
+            self.skipped += 1
+
+    def record(self, key, digest):
+        """
+        Parameters: dashboard key and the content hash that was just pushed successfully
+        """
+        with self.lock:
+            self.hashes[key] = digest
+            self.pushed += 1
+
+    def save(self):
+        """
+        Description: writes the recorded hashes to this state's file, if it has one
+        """
+        if self.path==None:
+            return
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory!="" and not os.path.isdir(directory):
+                os.makedirs(directory)
+            tmpPath = self.path + ".tmp"
+            with open(tmpPath, "w") as stateFile:
+                json.dump(self.hashes, stateFile, sort_keys=True)
+            os.replace(tmpPath, self.path)
+
+    def summary(self):
+        """
+        Returns: string with the number of dashboards pushed and skipped
+        """
+        return "%s pushed, %s skipped (unchanged)" % (self.pushed, self.skipped)
@@ -0,0 +1,87 @@
+"""
+Finds panels that only differ by host, so they can be sent as one grafana repeat panel.
+
+Per host dashboards usually hold one panel per host that is identical except for the host name
+in its queries, title and links. findRepeats replaces every such set of panels with a single
+RepeatedPanel over a host template variable. The dashboard json then holds the panel (and its
+value maps, thresholds and links) once instead of once per host:
+
+    d.addPanels(panels, repeat=True)
+"""
+
+import serializer
+from panel import RepeatedPanel, _replaceName
+
+_placeholder = "\x00host\x00"
+
+def _panelHost(panel):
+    """
+    Returns: the host all of panel's queries are for, or None if they are for several hosts
+    """
+    hosts = set(query.getHost() for query in panel.getQueries())
+    if len(hosts)!=1:
+        return None
+    host = hosts.pop()
+    if host.startswith("/") or host.startswith("$"):
+        return None
+    return host
+
+def _shapeKey(panel, host):
+    """
+    Returns: a key equal for all panels that are the same apart from their host
+    """
+    contents = {}
+    for key, value in panel.getDictionary().items():
+        if key not in ("id", "gridPos"):
+            contents[key] = value
+    size = panel.getSize() if panel._sizeSet() else None
+    queries = [query.replace(host=_placeholder) for query in panel.getQueries()]
+    shape = {"class": type(panel).__name__, "panel": _replaceName(contents, host, _placeholder),
+             "queries": [repr(query) for query in queries], "size": size,
+             "queryOptions": panel.queryOptions}
+    return serializer.dumpBytes(shape, sortKeys=True)
+
+def findRepeats(panels, variable="host", minPanels=2, variables=None):
+    """
+    Parameters: list of panels, the name of the host template variable, the fewest panels worth
+        repeating, and variables, a dictionary of the dashboard's variable names to their hosts
+        (see DashBoard.addPanels), which is updated with the variables used
+    Returns: list of panels where every set of at least minPanels panels that differ only by host
+        is replaced, at the place of its first panel, by a RepeatedPanel
+    Description: sets with the same hosts share a variable. Sets with other hosts get variables
+        named variable2, variable3, ...
+    """
+    if variables==None:
+        variables = {}
+    slots = []
+    shapes = {}
+    for panel in panels:
+        host = _panelHost(panel)
+        if host==None or isinstance(panel, RepeatedPanel):
+            slots.append(panel)
+            continue
+        key = _shapeKey(panel, host)
+        if key not in shapes:
+            shapes[key] = []
+            slots.append(key)
+        shapes[key].append((panel, host))
+
+    result = []
+    for slot in slots:
+        if not isinstance(slot, bytes):
+            result.append(slot)
+            continue
+        group = shapes[slot]
+        if len(group) < minPanels:
+            result.extend(panel for panel, host in group)
+            continue
+        hosts = tuple(host for panel, host in group)
+        name = variable
+        number = 1
+        while name in variables and variables[name]!=hosts:
+            number += 1
+            name = "%s%s" % (variable, number)
+        variables[name] = hosts
+        first, host = group[0]
+        result.append(RepeatedPanel(first, hosts, variable=name, host=host))
+    return result
@@ -0,0 +1,69 @@
+"""
+JSON encoding used by grafapy for pushing, exporting and importing dashboards.
+
+orjson is used when it is installed, otherwise the standard library json module. Both
+produce compact json (no spaces after separators) so output does not depend on which
+encoder is in use. Request bodies can optionally be gzip compressed.
+"""
+
+import gzip
+import json
+import instrument
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+encoders = ["json"]
+if orjson!=None:
+    encoders.insert(0, "orjson")
+encoder = encoders[0]
+
+def setEncoder(name):
+    """
+    Parameters: name of the encoder to use, "orjson" or "json"
+    """
+    global encoder
+    if name not in encoders:
+        raise Exception("Encoder '%s' is not available. Available encoders: %s" % (name, ", ".join(encoders)))
+    encoder = name
+
+def dumpBytes(obj, sortKeys=False):
+    """
+    Parameters: json-compatible object, and whether keys should be sorted
+    Returns: utf-8 encoded json bytes
+    """
+    with instrument.timed("serialize"):
+        if encoder=="orjson":
+            data = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sortKeys else None)
+        else:
+            data = json.dumps(obj, sort_keys=sortKeys, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    instrument.count("bytes_serialized", len(data))
+    return data
+
+def dumps(obj, sortKeys=False):
+    """
+    Parameters: json-compatible object, and whether keys should be sorted
+    Returns: json string
+    """
+    return dumpBytes(obj, sortKeys).decode("utf-8")
+
+def loads(data):
+    """
+    Parameters: json string or bytes
+    Returns: the decoded object
+    """
+    if encoder=="orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+def requestBody(obj, compress=False):
+    """
+    Parameters: json-compatible object, and whether to gzip the body
+    Returns: (body bytes, dictionary of extra headers to send with the body)
+    """
+    body = dumpBytes(obj)
+    if compress:
+        return gzip.compress(body, compresslevel=5), {"Content-Encoding": "gzip"}
+    return body, {}
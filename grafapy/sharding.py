@@ -0,0 +1,145 @@
+"""
+Splitting large dashboards, used by DashBoard.shard.
+
+Pages: panels are spread over several linked dashboards. Each panel's page is chosen from a
+stable hash of its shard key (its title by default), so adding or removing a panel only
+changes the page it lands on. The other pages stay byte for byte the same and can be skipped
+by a PushState, unless the number of pages itself has to change. Pages are picked with jump
+consistent hashing (Lamping and Veach), so going from N to N+1 pages only moves about 1/(N+1)
+of the panels, all of them onto the new page. Pass pageCount to pin the number of pages.
+
+Rows: panels stay in one dashboard, but are grouped, in order, into collapsed rows. Grafana
+only queries a row's panels once the row is expanded.
+"""
+
+import hashlib
+import re
+
+def _stableHash(key):
+    """
+    Returns: an integer hash of key that is the same in every python process
+    """
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:12], 16)
+
+def _jumpHash(key, buckets):
+    """
+    Returns: the bucket, from 0 to buckets-1, of an integer key. Adding a bucket only moves keys
+        into the new bucket (jump consistent hash).
+    """
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return bucket
+
+def _weights(panels):
+    """
+    Returns: list of (panel count, target count) for each panel
+    """
+    return [(1, len(panel.getQueries())) for panel in panels]
+
+def _fits(panelCount, targetCount, maxPanels, maxTargets):
+    """
+    Returns: bool, true if a shard with these totals is within the limits
+    """
+    if maxPanels!=None and panelCount > maxPanels:
+        return False
+    if maxTargets!=None and targetCount > maxTargets:
+        return False
+    return True
+
+def assignPages(panels, maxPanels=None, maxTargets=None, shardKey=None, pageCount=None):
+    """
+    Parameters: list of panels, the maximum number of panels and/or targets per page, an optional
+        function returning a panel's shard key (its title by default), and pageCount, the number
+        of pages to use instead of the fewest that keep every page within the limits
+    Returns: list of pages, each a list of panels in their original order. A page may be empty,
+        so that the pages after it keep their numbers.
+    Description: without pageCount, uses the smallest number of pages for which hashing every
+        panel's key into a page keeps all pages within the limits. A single panel with more
+        targets than maxTargets gets a page to itself.
+    """
+    if pageCount!=None:
+        if pageCount < 1:
+            raise Exception("pageCount must be at least 1, not %s" % pageCount)
+        maxPanels, maxTargets = None, None
+    elif maxPanels==None and maxTargets==None:
+        raise Exception("Set maxPanels and/or maxTargets (or pageCount) to shard a dashboard.")
+    if not panels:
+        return [[] for i in range(pageCount or 1)]
+    if shardKey==None:
+        shardKey = lambda panel: panel.getTitle()
+    hashes = [_stableHash(shardKey(panel)) for panel in panels]
+    weights = _weights(panels)
+    totalTargets = sum(targets for count, targets in weights)
+    pinned = pageCount!=None
+    pageCount = pageCount or 1
+    if maxPanels!=None:
+        pageCount = max(pageCount, -(-len(panels) // maxPanels))
+    if maxTargets!=None:
+        pageCount = max(pageCount, -(-totalTargets // maxTargets))
+    while True:
+        pages = [[] for i in range(pageCount)]
+        totals = [[0, 0] for i in range(pageCount)]
+        for panel, panelHash, (count, targets) in zip(panels, hashes, weights):
+            page = _jumpHash(panelHash, pageCount)
+            pages[page].append(panel)
+            totals[page][0] += count
+            totals[page][1] += targets
+        if pinned or pageCount >= len(panels):
+            break
+        if all(_fits(count, targets, maxPanels, maxTargets) or len(page)==1
+                for page, (count, targets) in zip(pages, totals)):
+            break
+        pageCount += 1
+    return pages
+
+def assignRows(panels, maxPanels=None, maxTargets=None):
+    """
+    Parameters: list of panels, and the maximum number of panels and/or targets per row
+    Returns: list of rows, consecutive runs of panels in their original order
+    """
+    if maxPanels==None and maxTargets==None:
+        raise Exception("Set maxPanels and/or maxTargets to shard a dashboard.")
+    rows = [[]]
+    count, targets = 0, 0
+    for panel, (panelCount, panelTargets) in zip(panels, _weights(panels)):
+        if rows[-1] and not _fits(count + panelCount, targets + panelTargets, maxPanels, maxTargets):
+            rows.append([])
+            count, targets = 0, 0
+        rows[-1].append(panel)
+        count += panelCount
+        targets += panelTargets
+    return rows
+
+def pageUID(baseUID, page):
+    """
+    Parameters: uid (or title) of the unsharded dashboard, and a 1-based page number
+    Returns: a stable grafana uid (at most 40 characters) for that page
+    """
+    base = re.sub(r"[^A-Za-z0-9_-]+", "-", baseUID).strip("-")
+    if len(base) > 30:
+        base = base[:21] + hashlib.sha1(baseUID.encode("utf-8")).hexdigest()[:8]
+    return "%s-p%d" % (base, page)
+
+def navigationLinks(uids, titles):
+    """
+    Parameters: lists of page uids and page titles
+    Returns: grafana dashboard links pointing to every page
+    """
+    links = []
+    for uid, title in zip(uids, titles):
+        links.append({"title": title, "type": "link", "url": "/d/%s" % uid, "icon": "dashboard",
+                      "asDropdown": False, "includeVars": True, "keepTime": True, "targetBlank": False,
+                      "tags": [], "tooltip": ""})
+    return links
+
+def rowPanel(title, panelID, y, panels, collapsed=True):
+    """
+    Parameters: row title, its panel id, its y position, the panel dictionaries it holds, and
+        whether it starts collapsed
+    Returns: a grafana row panel dictionary
+    """
+    return {"type": "row", "title": title, "id": panelID, "collapsed": collapsed,
+            "gridPos": {"h": 1, "w": 24, "x": 0, "y": y}, "panels": panels if collapsed else []}
@@ -0,0 +1,360 @@
+#!/usr/bin/python3
+"""
+Lightweight stand-ins for grafana and zabbix, for testing and load testing grafapy offline.
+
+GrafanaStub serves the parts of the grafana http api grafapy uses, keeping dashboards in memory:
+    POST /api/dashboards/db                   create or overwrite a dashboard
+    GET  /api/dashboards/uid/<uid>            fetch a dashboard
+    GET  /api/dashboards/uid/<uid>/versions   latest versions of a dashboard
+    GET  /api/search                          search dashboards (query= and limit= supported)
+
+ZabbixStub serves zabbix's json-rpc api at /api_jsonrpc.php for hostgroup.get, host.get,
+item.get, user.login and apiinfo.version, from a {group name: [host names]} inventory.
+
+Both can add latency, inject errors (500) and rate limit (429 with Retry-After):
+
+    with GrafanaStub(latency=0.02, errorRate=0.01, rateLimitRate=0.05) as grafana:
+        d = DashBoard(title="test", token="token", url=grafana.url + "/api/dashboards/db")
+        d.push()
+
+Run this file to serve both from the command line, see --help.
+"""
+
+import abc
+import argparse
+import gzip
+import http.server
+import json
+import random
+import re
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+class _StubServer(abc.ABC):
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, errorRate=0.0, rateLimitRate=0.0, seed=0):
+        """
+        Parameters: address to listen on (port 0 picks a free port), latency in seconds added to
+            every request, the fraction of requests answered with a 500, the fraction answered with a
+            429, and a seed so injected failures are reproducible.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.errorRate = errorRate
+        self.rateLimitRate = rateLimitRate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.server = None
+
+    @property
+    def url(self):
+        """
+        Returns: base url of the running server, e.g. http://127.0.0.1:41234
+        """
+        return "http://%s:%s" % (self.host, self.server.server_port)
+
+    def start(self):
+        """
+        Returns: this server, now serving from a background thread
+        """
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub._handle(self, "GET")
+
+            def do_POST(self):
+                stub._handle(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Description: stops serving and closes the listening socket
+        """
+        if self.server!=None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, excType, exc, tb):
+        self.stop()
+
+    def _handle(self, handler, method):
+        """
+        Description: reads the request, applies latency and failure injection, and sends the response
+            of self.route
+        """
+        length = int(handler.headers.get("Content-Length", 0))
+        body = handler.rfile.read(length) if length else b""
+        if handler.headers.get("Content-Encoding")=="gzip":
+            body = gzip.decompress(body)
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+        if self.latency:
+            time.sleep(self.latency)
+        headers = {}
+        if roll < self.rateLimitRate:
+            status, payload = 429, {"message": "Too many requests"}
+            headers["Retry-After"] = "1"
+        elif roll < self.rateLimitRate + self.errorRate:
+            status, payload = 500, {"message": "Injected error"}
+        else:
+            parsed = urlparse(handler.path)
+            try:
+                status, payload = self.route(method, parsed.path, parse_qs(parsed.query), body)
+            except Exception as e:
+                status, payload = 500, {"message": str(e)}
+        data = json.dumps(payload).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    @abc.abstractmethod
+    def route(self, method, path, query, body):
+        """
+        Returns: (status code, json-compatible payload) for a request. Implemented by each stub.
+        """
+
+class GrafanaStub(_StubServer):
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, errorRate=0.0, rateLimitRate=0.0, seed=0):
+        """
+        Parameters: see _StubServer. Dashboards pushed to the stub are kept in self.dashboards,
+            keyed by uid.
+        """
+        _StubServer.__init__(self, host, port, latency, errorRate, rateLimitRate, seed)
+        self.dashboards = {}
+        self.versions = {}
+        self.nextID = 1
+
+    def route(self, method, path, query, body):
+        if method=="POST" and path=="/api/dashboards/db":
+            return self._save(json.loads(body))
+        match = re.match(r"^/api/dashboards/uid/([^/]+)(/versions)?$", path)
+        if method=="GET" and match:
+            return self._get(match.group(1), match.group(2)!=None, query)
+        if method=="GET" and path=="/api/search":
+            return self._search(query)
+        return 404, {"message": "Not found"}
+
+    def _save(self, request):
+        """
+        Returns: response to POST /api/dashboards/db
+        """
+        dashboard = request.get("dashboard")
+        if not isinstance(dashboard, dict) or not dashboard.get("title"):
+            return 400, {"message": "Dashboard title cannot be empty", "status": "bad-request"}
+        with self.lock:
+            uid = dashboard.get("uid")
+            if not uid:
+                existing = [key for key, d in self.dashboards.items() if d["dashboard"]["title"]==dashboard["title"]]
+                uid = existing[0] if existing else "stub%06d" % self.nextID
+            if uid in self.dashboards and not request.get("overwrite"):
+                return 412, {"message": "A dashboard with the same name already exists", "status": "name-exists"}
+            if uid in self.dashboards:
+                dashboardID = self.dashboards[uid]["dashboard"]["id"]
+            else:
+                dashboardID = self.nextID
+                self.nextID += 1
+            version = self.versions.get(uid, 0) + 1
+            stored = dict(dashboard, id=dashboardID, uid=uid, version=version)
+            self.dashboards[uid] = {"dashboard": stored, "meta": {"slug": _slug(dashboard["title"]), "folderId": 0,
+                                    "version": version, "url": "/d/%s/%s" % (uid, _slug(dashboard["title"]))}}
+            self.versions[uid] = version
+        return 200, {"id": dashboardID, "uid": uid, "url": "/d/%s/%s" % (uid, _slug(dashboard["title"])),
+                     "status": "success", "version": version, "slug": _slug(dashboard["title"])}
+
+    def _get(self, uid, versions, query):
+        """
+        Returns: response to GET /api/dashboards/uid/<uid>[/versions]
+        """
+        with self.lock:
+            if uid not in self.dashboards:
+                return 404, {"message": "Dashboard not found"}
+            if versions:
+                limit = int(query.get("limit", ["100"])[0])
+                latest = self.versions[uid]
+                dashboardID = self.dashboards[uid]["dashboard"]["id"]
+                history = [{"id": v, "dashboardId": dashboardID, "version": v} for v in range(latest, 0, -1)]
+                return 200, history[:limit]
+            return 200, self.dashboards[uid]
+
+    def _search(self, query):
+        """
+        Returns: response to GET /api/search
+        """
+        text = query.get("query", [""])[0].lower()
+        limit = int(query.get("limit", ["1000"])[0])
+        results = []
+        with self.lock:
+            for uid, entry in sorted(self.dashboards.items()):
+                dashboard = entry["dashboard"]
+                if text in dashboard["title"].lower():
+                    results.append({"id": dashboard["id"], "uid": uid, "title": dashboard["title"],
+                                    "url": entry["meta"]["url"], "type": "dash-db", "tags": dashboard.get("tags", [])})
+        return 200, results[:limit]
+
+class ZabbixStub(_StubServer):
+    def __init__(self, inventory=None, items=None, host="127.0.0.1", port=0, latency=0.0, errorRate=0.0, rateLimitRate=0.0, seed=0):
+        """
+        Parameters: inventory, a dictionary of {group name: [host names]}, items, a list of item names
+            every host has (defaults to a few common ones), and see _StubServer for the rest.
+            self.calls counts calls per json-rpc method.
+        """
+        _StubServer.__init__(self, host, port, latency, errorRate, rateLimitRate, seed)
+        if inventory==None:
+            inventory = {}
+        if items==None:
+            items = ["ICMP ping", "System uptime", "Number of logged in users", "Processor load (1 min average per core)"]
+        self.calls = {}
+        self.groups = []
+        self.hosts = {}
+        for groupID, (groupName, hostNames) in enumerate(sorted(inventory.items()), 1):
+            group = {"groupid": str(groupID), "name": groupName, "hostids": []}
+            for hostName in hostNames:
+                if hostName not in self.hosts:
+                    self.hosts[hostName] = {"hostid": str(10000 + len(self.hosts)), "host": hostName, "name": hostName, "groupids": []}
+                self.hosts[hostName]["groupids"].append(group["groupid"])
+                group["hostids"].append(self.hosts[hostName]["hostid"])
+            self.groups.append(group)
+        self.items = items
+
+    def route(self, method, path, query, body):
+        if method!="POST" or path!="/api_jsonrpc.php":
+            return 404, {"message": "Not found"}
+        request = json.loads(body)
+        rpcMethod = request.get("method")
+        params = request.get("params") or {}
+        with self.lock:
+            self.calls[rpcMethod] = self.calls.get(rpcMethod, 0) + 1
+        handlers = {"apiinfo.version": lambda params: "4.0.0",
+                    "user.login": lambda params: "stub-auth-token",
+                    "hostgroup.get": self._hostgroupGet,
+                    "host.get": self._hostGet,
+                    "item.get": self._itemGet}
+        if rpcMethod not in handlers:
+            return 200, {"jsonrpc": "2.0", "id": request.get("id"),
+                         "error": {"code": -32601, "message": "Method not found.", "data": rpcMethod}}
+        return 200, {"jsonrpc": "2.0", "id": request.get("id"), "result": handlers[rpcMethod](params)}
+
+    def _hostsByID(self):
+        """
+        Returns: dictionary of hostid to host
+        """
+        return dict((host["hostid"], host) for host in self.hosts.values())
+
+    def _hostgroupGet(self, params):
+        names = (params.get("filter") or {}).get("name")
+        if isinstance(names, str):
+            names = [names]
+        groupIDs = params.get("groupids")
+        if isinstance(groupIDs, str):
+            groupIDs = [groupIDs]
+        hostsByID = self._hostsByID()
+        result = []
+        for group in self.groups:
+            if names!=None and group["name"] not in names:
+                continue
+            if groupIDs!=None and group["groupid"] not in groupIDs:
+                continue
+            entry = {"groupid": group["groupid"], "name": group["name"]}
+            if params.get("selectHosts"):
+                entry["hosts"] = [_select(hostsByID[hostID], params["selectHosts"]) for hostID in group["hostids"]]
+            result.append(entry)
+        return result
+
+    def _hostGet(self, params):
+        groupIDs = params.get("groupids")
+        if isinstance(groupIDs, str):
+            groupIDs = [groupIDs]
+        names = (params.get("filter") or {}).get("host")
+        if isinstance(names, str):
+            names = [names]
+        result = []
+        for host in sorted(self.hosts.values(), key=lambda host: host["hostid"]):
+            if groupIDs!=None and not set(groupIDs) & set(host["groupids"]):
+                continue
+            if names!=None and host["host"] not in names:
+                continue
+            result.append(_select(host, params.get("output", "extend")))
+        return result
+
+    def _itemGet(self, params):
+        hostIDs = params.get("hostids")
+        if isinstance(hostIDs, str):
+            hostIDs = [hostIDs]
+        names = (params.get("filter") or {}).get("name")
+        if isinstance(names, str):
+            names = [names]
+        search = (params.get("search") or {}).get("name")
+        result = []
+        for host in sorted(self.hosts.values(), key=lambda host: host["hostid"]):
+            if hostIDs!=None and host["hostid"] not in hostIDs:
+                continue
+            for i, item in enumerate(self.items):
+                if names!=None and item not in names:
+                    continue
+                if search!=None and search.lower() not in item.lower():
+                    continue
+                entry = {"itemid": str(int(host["hostid"]) * 100 + i), "hostid": host["hostid"], "name": item, "lastvalue": "1"}
+                result.append(_select(entry, params.get("output", "extend")))
+        return result
+
+def _select(record, output):
+    """
+    Returns: record limited to the fields requested by a zabbix "output" parameter
+    """
+    if output=="extend" or output==True:
+        return dict((key, value) for key, value in record.items() if key!="groupids")
+    if isinstance(output, str):
+        output = [output]
+    return dict((key, record[key]) for key in output if key in record)
+
+def _slug(title):
+    """
+    Returns: grafana-style url slug for a dashboard title
+    """
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stand-in grafana and zabbix apis.")
+    parser.add_argument("--grafana-port", type=int, default=3000)
+    parser.add_argument("--zabbix-port", type=int, default=8080)
+    parser.add_argument("--groups", type=int, default=5, help="number of zabbix host groups")
+    parser.add_argument("--hosts", type=int, default=40, help="hosts per zabbix host group")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    inventory = dict(("Lab_%02d" % g, ["lab%02d-host%03d" % (g, h) for h in range(args.hosts)]) for g in range(args.groups))
+    grafana = GrafanaStub(port=args.grafana_port, latency=args.latency, errorRate=args.error_rate, rateLimitRate=args.rate_limit_rate).start()
+    zabbix = ZabbixStub(inventory, port=args.zabbix_port, latency=args.latency, errorRate=args.error_rate, rateLimitRate=args.rate_limit_rate).start()
+    print("grafana stub: %s/api/dashboards/db" % grafana.url)
+    print("zabbix stub:  %s/api_jsonrpc.php" % zabbix.url)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        grafana.stop()
+        zabbix.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Per panel query options: maxDataPoints, interval and cacheTimeout.
+
+A graph cannot draw more points than it has pixels, so the number of points it asks zabbix for
+follows its width on the 24 column grid: a panel a third of the dashboard wide asks for a third
+of the points of a full width one. No panel asks for more than the 100 points the panel
+templates use, so tuning only ever lowers the load. A singlestat only shows one reduced value, so unless it draws
+a sparkline it asks for just a few points, as long as that value is the current or average one.
+Other reducers (min, max, total, delta, range) would change with fewer points, so those
+singlestats keep grafana's defaults, as do other panel types (text, table, timeseries, ...).
+zabbix items are rarely collected more often than once a minute, so no tuned panel asks for a
+finer interval than that.
+
+DashBoard applies these defaults to panels as it lays them out. Options given to
+DashBoard.setQueryOptions replace the defaults for the whole dashboard, and options given to
+Panel.setQueryOptions replace both for one panel.
+"""
+
+from layout import gridColumns
+
+queryOptionNames = ("maxDataPoints", "interval", "cacheTimeout")
+
+#dictionary types of the panels that are tuned: graphs, singlestats and math singlestats
+graphTypes = ("graph",)
+singleStatTypes = ("singlestat", "blackmirror1-singlestat-math-panel")
+#singlestat reducers whose value stays the same with fewer, consolidated, points
+pointReducers = ("current", "avg")
+
+#points per grid column, 96 for a full width graph, about one point every 20 pixels on a 1920
+#pixel wide screen
+pointsPerColumn = 4
+#maxDataPoints of the panel templates, the most points a tuned panel asks for
+maxPoints = 100
+#points a singlestat without a sparkline needs to find its current or average value
+singleStatPoints = 10
+
+def defaultOptions(panelType, width, sparkline=False, pointsPerColumn=pointsPerColumn, valueName="current"):
+    """
+    Parameters: panel type (the "type" of its dictionary), its width in grid columns, whether it
+        shows a sparkline, the number of points to request per grid column, and the singlestat's
+        reducer (its valueName)
+    Returns: dictionary of maxDataPoints, interval and cacheTimeout for the panel, empty for panels
+        that keep grafana's defaults
+    """
+    width = max(1, min(int(width), gridColumns))
+    if panelType not in graphTypes + singleStatTypes:
+        return {}
+    if panelType in graphTypes:
+        return {"maxDataPoints": min(maxPoints, width * pointsPerColumn), "interval": "1m", "cacheTimeout": None}
+    if valueName not in pointReducers:
+        return {}
+    if sparkline:
+        points = min(maxPoints, max(singleStatPoints, width * pointsPerColumn // 2))
+    else:
+        points = singleStatPoints
+    return {"maxDataPoints": points, "interval": "1m", "cacheTimeout": "60"}
+
+def tune(panel, overrides=None):
+    """
+    Parameters: a laid out panel, and the dashboard's query option overrides (a dictionary that may
+        also hold pointsPerColumn). A repeated panel is tuned for the width of one of its copies.
+    Description: writes the panel's query options to its dictionary. Options set on the panel itself
+        win over overrides, which win over the defaults for the panel's type and width. Panels of
+        other types than graphs and singlestats are left as they are.
+    """
+    if overrides==None:
+        overrides = {}
+    dictionary = panel.dictionary
+    if dictionary.get("type") not in graphTypes + singleStatTypes:
+        return
+    sparkline = isinstance(dictionary.get("sparkline"), dict) and dictionary["sparkline"].get("show", False)
+    width = panel.getSize()[1]
+    if dictionary.get("repeat") and dictionary.get("maxPerRow"):
+        #a repeated panel spans the row, but grafana draws each copy maxPerRow to a row
+        width = gridColumns // int(dictionary["maxPerRow"])
+    options = defaultOptions(dictionary["type"], width, sparkline,
+                             overrides.get("pointsPerColumn", pointsPerColumn), dictionary.get("valueName", "current"))
+    for name in queryOptionNames:
+        if name in panel.queryOptions:
+            options[name] = panel.queryOptions[name]
+        elif name in overrides:
+            options[name] = overrides[name]
+    dictionary.update(options)
@@ -0,0 +1,59 @@
+"""
+Tests for the asyncio client against the local grafana stub: concurrent pushes through one shared
+client, fetching dashboards back, and errors.
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+pytest.importorskip("aiohttp")
+
+from aclient import AsyncGrafanaClient
+from dashboard import DashBoard
+from panel import GraphPanel, Query
+from stubserver import GrafanaStub
+
+def buildDashboard(i, url):
+    """
+    Returns: a dashboard with uid "async-<i>" and two graph panels, pushed to url
+    """
+    d = DashBoard(title="async %s" % i, token="token", url=url)
+    d.uid = "async-%s" % i
+    d.dictionary["dashboard"]["uid"] = d.uid
+    d.addPanels([GraphPanel(title="load %s" % host, queryArray=[Query(host, "Processor load")]) for host in ("a", "b")])
+    return d
+
+def test_pushAndFetch():
+    with GrafanaStub(latency=0.01) as grafana:
+        postURL = grafana.url + "/api/dashboards/db"
+        fetchURL = grafana.url + "/api/dashboards/uid/"
+        dashboards = [buildDashboard(i, postURL) for i in range(50)]
+
+        async def sync():
+            async with AsyncGrafanaClient(limit=10) as client:
+                pushed = await asyncio.gather(*[d.apush(client=client) for d in dashboards])
+                fetched = await asyncio.gather(*[DashBoard.afrom_uid(d.uid, "token", fetchURL, client=client)
+                                                 for d in dashboards])
+            return pushed, fetched
+
+        pushed, fetched = asyncio.run(sync())
+        assert [status for status, text in pushed]==50 * [200]
+        assert len(grafana.dashboards)==50
+        for original, copy in zip(dashboards, fetched):
+            assert copy.uid==original.uid
+            assert copy.title==original.title
+            assert [panel.getTitle() for panel in copy.getPanels()]==["load a", "load b"]
+
+def test_errors():
+    with GrafanaStub(errorRate=1.0) as grafana:
+        d = buildDashboard(0, grafana.url + "/api/dashboards/db")
+        with pytest.raises(Exception):
+            asyncio.run(d.apush())
+    with GrafanaStub() as grafana:
+        with pytest.raises(Exception):
+            asyncio.run(DashBoard.afrom_uid("missing", "token", grafana.url + "/api/dashboards/uid/"))
@@ -0,0 +1,60 @@
+"""
+Tests for Panel.clone and Panel.with_host: clones export the same json as panels built with the
+constructor, including coalesced panels and panels imported from json.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import planner
+import serializer
+from dashboard import DashBoard
+from panel import MathStatPanel, Query
+
+link = "http://grafana/d/3AcvQxVWk/any-single-machine-status?orgId=1&var-Host="
+
+def statusPanel(host):
+    """
+    Returns: an uptime panel for host, built with the constructor
+    """
+    queries = [Query(host, "System uptime", alias="uptime"), Query(host, "ICMP ping", alias="ping")]
+    return MathStatPanel(title=host + " uptime", queryArray=queries, colors=["grey", "red", "yellow", "green"],
+            thresholds="1, 1800, 172800", units="s", decimals=1, math="uptime*ping", colorBackground=True,
+            absLink=link + host)
+
+def export(panels):
+    """
+    Returns: json of a dashboard holding panels
+    """
+    d = DashBoard(title="fan out", panelsPerRow=8)
+    d.addPanels(panels)
+    return d.exportToJSON()
+
+def test_withHostSameJSON():
+    hosts = ["host%03d" % i for i in range(100)]
+    prototype = statusPanel(hosts[0])
+    assert export([prototype.with_host(host) for host in hosts])==export([statusPanel(host) for host in hosts])
+
+def test_cloneLeavesPrototype():
+    prototype = statusPanel("abra")
+    before = serializer.dumps(prototype.getDictionary())
+    clone = prototype.clone(title="other", thresholds="5")
+    clone.addQueries([Query("meowth", "ICMP ping", alias="ping2")])
+    clone.getDictionary()
+    assert serializer.dumps(prototype.getDictionary())==before
+    assert len(clone.getDictionary()["targets"])==3
+
+def test_cloneCoalesced():
+    queries = [Query(host, "Number of logged in users", alias=host) for host in ("a", "b", "c")]
+    panel = MathStatPanel(title="users", queryArray=queries, math="a+b+c")
+    planner.coalesce(panel)
+    assert serializer.dumps(panel.clone().getDictionary())==serializer.dumps(panel.getDictionary())
+    rebuilt = panel.clone(queryArray=queries[:2]).getDictionary()
+    assert rebuilt["math"]=="a+b+c"
+    assert len(rebuilt["targets"])==2
+
+def test_cloneImported():
+    panel = MathStatPanel(JSON=serializer.dumps(statusPanel("abra").getDictionary()))
+    assert serializer.dumps(panel.clone().getDictionary())==serializer.dumps(panel.getDictionary())
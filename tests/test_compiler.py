@@ -0,0 +1,66 @@
+"""
+Tests for the spec compiler: expansion of forEach, groups and matrices, panels copied from the
+cache giving the same dashboards as freshly built ones, and only changed dashboards coming back.
+"""
+
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+from compiler import Compiler
+
+document = {
+    "groups": {"Lab_238": ["abra", "charmander", "meowth"], "Lab_240": ["pikachu", "eevee"]},
+    "defaults": {"panelsPerRow": 3},
+    "dashboards": [
+        {"title": "Users Per Lab", "uid": "users-per-lab",
+         "panels": [{"type": "math", "forEach": {"group": ["Lab_238", "Lab_240"]}, "title": "Users in {group}",
+                     "hosts": {"group": "{group}"}, "items": ["Number of logged in users"], "alias": "host",
+                     "math": "sum", "postfix": " user(s)"}]},
+        {"title": "Lab 238 Load", "uid": "lab-238-load",
+         "panels": [{"type": "graph", "forEach": {"host": {"group": "Lab_238"}}, "title": "{host} load",
+                     "queries": [{"host": "{host}", "item": "Processor load"}]}]},
+    ]}
+
+def exports(dashboards):
+    """
+    Returns: dictionary of dashboard uids to their json
+    """
+    return dict((d.uid, d.exportToJSON()) for d in dashboards)
+
+def test_expand():
+    specs = Compiler().expand(document)
+    assert [len(spec["panels"]) for spec in specs]==[2, 3]
+    users = specs[0]["panels"][1]
+    assert users["title"]=="Users in Lab_240"
+    assert users["math"]=="pikachu+eevee"
+    assert users["queryTable"]["hosts"]==["pikachu", "eevee"]
+    assert specs[1]["panels"][2]["queries"]==[{"host": "meowth", "item": "Processor load"}]
+    assert specs[0]["panelsPerRow"]==3
+
+def test_cacheHitSameOutput():
+    compiler = Compiler()
+    built = exports(compiler.compile(document))
+    assert (compiler.hits, compiler.misses)==(0, 5)
+    cached = exports(compiler.compile(document))
+    assert (compiler.hits, compiler.misses)==(5, 5)
+    assert cached==built
+
+def test_cacheDirectory(tmp_path):
+    built = exports(Compiler(cacheDirectory=str(tmp_path)).compile(document))
+    compiler = Compiler(cacheDirectory=str(tmp_path))
+    assert exports(compiler.compile(document))==built
+    assert (compiler.hits, compiler.misses)==(5, 0)
+
+def test_changedOnly():
+    compiler = Compiler()
+    for dashboard in compiler.compile(document):
+        compiler.markPushed(dashboard)
+    assert compiler.compile(document, changedOnly=True)==[]
+    changed = copy.deepcopy(document)
+    changed["dashboards"][1]["panels"][0]["title"] = "{host} processor load"
+    dashboards = compiler.compile(changed, changedOnly=True)
+    assert [d.uid for d in dashboards]==["lab-238-load"]
+    assert compiler.misses==8
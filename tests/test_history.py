@@ -0,0 +1,98 @@
+"""
+Tests for the local dashboard history: structural deltas round trip, stay small when panels are
+removed, and versions can be read back, diffed and rolled back after reopening the history.
+"""
+
+import copy
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import serializer
+from dashboard import DashBoard
+from history import DashboardHistory, delta, applyDelta
+from panel import GraphPanel, Query
+
+def randomValue(rng, depth=0):
+    """
+    Returns: a random json value, nested at most 4 deep
+    """
+    r = rng.random()
+    if depth > 3 or r < 0.3:
+        return rng.choice([1, "a", None, 2.5, "b", True])
+    if r < 0.65:
+        return [randomValue(rng, depth + 1) for i in range(rng.randint(0, 6))]
+    return {rng.choice("abcde"): randomValue(rng, depth + 1) for i in range(rng.randint(0, 4))}
+
+def mutate(rng, value):
+    """
+    Returns: a copy of value with some elements inserted, removed, changed or deleted
+    """
+    value = copy.deepcopy(value)
+    if isinstance(value, list):
+        for i in range(rng.randint(0, 3)):
+            choice = rng.random()
+            if choice < 0.3 and value:
+                value.pop(rng.randrange(len(value)))
+            elif choice < 0.6:
+                value.insert(rng.randint(0, len(value)), randomValue(rng, 2))
+            elif value:
+                i = rng.randrange(len(value))
+                value[i] = mutate(rng, value[i])
+        return value
+    if isinstance(value, dict):
+        for key in list(value):
+            if rng.random() < 0.3:
+                value[key] = mutate(rng, value[key])
+            elif rng.random() < 0.1:
+                del value[key]
+        if rng.random() < 0.3:
+            value[rng.choice("xyz")] = randomValue(rng, 2)
+        return value
+    return randomValue(rng, 2) if rng.random() < 0.5 else value
+
+def test_deltaRoundTrip():
+    rng = random.Random(0)
+    for i in range(3000):
+        old = randomValue(rng)
+        new = mutate(rng, old) if rng.random() < 0.8 else randomValue(rng)
+        ops = serializer.loads(serializer.dumps(delta(old, new)))
+        assert applyDelta(copy.deepcopy(old), ops)==new
+
+def buildDashboard(panelCount):
+    """
+    Returns: the dictionary of a dashboard with panelCount graph panels
+    """
+    d = DashBoard(title="history test", panelsPerRow=3)
+    d.uid = "history-test"
+    d.addPanels([GraphPanel(title="panel %s" % i, queryArray=[Query("h%s" % i, "Processor load")]) for i in range(panelCount)])
+    return copy.deepcopy(d.getDictionary())
+
+def test_removalDeltaSmall():
+    old = buildDashboard(60)
+    new = copy.deepcopy(old)
+    del new["dashboard"]["panels"][30]
+    ops = delta(old, new)
+    assert ["r", ["dashboard", "panels", 30]] in ops
+    assert not any(op[0]=="i" for op in ops)
+    assert len(serializer.dumps(ops)) < len(serializer.dumps(new)) / 5
+
+def test_recordReopenRollback(tmp_path):
+    history = DashboardHistory(str(tmp_path), snapshotEvery=3)
+    versions = [buildDashboard(n) for n in range(10, 17)]
+    for dictionary in versions:
+        assert history.record("history-test", dictionary)!=None
+    assert history.record("history-test", versions[-1])==None
+
+    reopened = DashboardHistory(str(tmp_path), snapshotEvery=3)
+    assert [version for version, pushed, digest in reopened.versions("history-test")]==list(range(1, 8))
+    for number, dictionary in enumerate(versions, 1):
+        assert reopened.get("history-test", number)==dictionary
+    assert applyDelta(reopened.get("history-test", 2), reopened.diff("history-test", 2, 5))==versions[4]
+    assert "insert dashboard/panels/10" in reopened.formatDiff(reopened.diff("history-test", 1, 2))
+
+    rolledBack = reopened.rollback("history-test", 3)
+    assert rolledBack.uid=="history-test"
+    assert len(rolledBack.getPanels())==12
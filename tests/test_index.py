@@ -0,0 +1,54 @@
+"""
+Tests for the dashboard's panel index: lookups and removals follow queries added after a panel
+was added to the dashboard.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+from dashboard import DashBoard
+from panel import GraphPanel, Query
+
+def buildDashboard():
+    """
+    Returns: (a dashboard, its panels), one panel per host a0 to a4
+    """
+    panels = [GraphPanel(title="panel %s" % i, queryArray=[Query("a%s" % i, "Processor load")]) for i in range(5)]
+    d = DashBoard(title="index test")
+    d.addPanels(panels)
+    return d, panels
+
+def test_addQueriesAfterIndexed():
+    d, panels = buildDashboard()
+    assert d.findPanels(host="a1")==[panels[1]]
+    panels[1].addQueries([Query("b", "Number of logged in users")])
+    assert d.findPanels(item="Number of logged in users")==[panels[1]]
+    assert d.removePanels(hosts=["b"])==1
+    assert panels[1] not in d.getPanels()
+
+def test_replacedQueries():
+    d, panels = buildDashboard()
+    d.findPanels(host="a2")
+    panels[2].queries = [Query("c", "ICMP ping")]
+    assert d.findPanels(host="a2")==[]
+    assert d.findPanels(host="c")==[panels[2]]
+
+def test_sharedPanel():
+    first, panels = buildDashboard()
+    second = DashBoard(title="second index test")
+    second.addPanels(panels[:2])
+    first.findPanels(host="a0")
+    second.findPanels(host="a0")
+    panels[0].addQueries([Query("b", "ICMP ping")])
+    assert first.findPanels(host="b")==[panels[0]]
+    assert second.findPanels(host="b")==[panels[0]]
+
+def test_changesElsewhereLeaveIndexClean():
+    d, panels = buildDashboard()
+    d.findPanels(host="a0")
+    other = GraphPanel(title="other", queryArray=[Query("c", "ICMP ping")])
+    other.addQueries([Query("d", "ICMP ping")])
+    panels[1].clone().addQueries([Query("e", "ICMP ping")])
+    assert not d._index["changed"]
@@ -0,0 +1,106 @@
+"""
+Tests for the grid layout engine: positions and sizes are integers inside the 24 column grid, no
+two panels overlap, and a row never holds more than panelsPerRow default sized panels.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+from dashboard import DashBoard
+from layout import gridColumns
+from panel import GraphPanel, Query
+
+sizes = [(8, 6), (6, 12), (4, 4), (10, 8)]
+
+def buildPanels(n, mixed=False):
+    """
+    Returns: n graph panels, with a mix of sizes if mixed is set
+    """
+    panels = []
+    for i in range(n):
+        p = GraphPanel(title="panel %s" % i, queryArray=[Query("host%05d" % i, "Processor load")])
+        if mixed:
+            h, w = sizes[i % len(sizes)]
+            p.setSize(h, w)
+        panels.append(p)
+    return panels
+
+def buildDashboard(panels, panelsPerRow=4, pack=False):
+    """
+    Returns: a dashboard holding panels
+    """
+    d = DashBoard(title="layout test", panelsPerRow=panelsPerRow, pack=pack)
+    d.addPanels(panels)
+    return d
+
+def gridPositions(d):
+    """
+    Returns: list of the gridPos dictionaries of the dashboard's panels
+    """
+    return [panel.getDictionary()["gridPos"] for panel in d.getPanels()]
+
+def checkLayout(d):
+    """
+    Description: fails if any panel is misplaced or overlaps another panel
+    """
+    occupied = {}
+    for i, gridPos in enumerate(gridPositions(d)):
+        x, y, w, h = gridPos["x"], gridPos["y"], gridPos["w"], gridPos["h"]
+        assert all(isinstance(value, int) for value in (x, y, w, h)), gridPos
+        assert x >= 0 and x + w <= gridColumns, gridPos
+        for row in range(y, y + h):
+            for column in range(x, x + w):
+                assert (column, row) not in occupied, "panel %s overlaps panel %s" % (i, occupied[(column, row)])
+                occupied[(column, row)] = i
+
+def rowCounts(d):
+    """
+    Returns: list of the number of panels in each row, top to bottom
+    """
+    rows = {}
+    for gridPos in gridPositions(d):
+        rows[gridPos["y"]] = rows.get(gridPos["y"], 0) + 1
+    return [rows[y] for y in sorted(rows)]
+
+@pytest.mark.parametrize("pack,mixed", [(False, False), (False, True), (True, True)])
+def test_addAndRemove(pack, mixed):
+    n = 10000
+    panels = buildPanels(n, mixed)
+    d = buildDashboard(panels[:n // 2], pack=pack)
+    for i in range(n // 2, n, n // 20):
+        d.addPanels(panels[i:i + n // 20])
+    checkLayout(d)
+    removed = d.removePanels(hosts=["host%05d" % i for i in range(n // 4, n, 37)])
+    assert removed > 0
+    checkLayout(d)
+
+@pytest.mark.parametrize("panelsPerRow", [5, 7, 9, 10])
+def test_removeKeepsPanelsPerRow(panelsPerRow):
+    d = buildDashboard(buildPanels(4 * panelsPerRow), panelsPerRow=panelsPerRow)
+    d.removePanelsByHost(["host00000"])
+    checkLayout(d)
+    assert rowCounts(d)==3 * [panelsPerRow] + [panelsPerRow - 1]
+    d.addPanels(buildPanels(2))
+    assert rowCounts(d)==4 * [panelsPerRow] + [1]
+
+@pytest.mark.parametrize("panelsPerRow", [1, 2, 3, 4, 5, 6, 7, 9, 10, 13, 24])
+def test_panelsPerRow(panelsPerRow):
+    d = buildDashboard(buildPanels(3 * panelsPerRow), panelsPerRow=panelsPerRow)
+    checkLayout(d)
+    assert rowCounts(d)==3 * [panelsPerRow]
+    rows = {}
+    for gridPos in gridPositions(d):
+        rows.setdefault(gridPos["y"], []).append(gridPos)
+    for row in rows.values():
+        assert [gridPos["x"] for gridPos in row] == [i * (gridColumns // panelsPerRow) for i in range(panelsPerRow)]
+
+def test_sizedPanelsFillRow():
+    panels = buildPanels(6)
+    for panel in panels:
+        panel.setSize(8, 4)
+    d = buildDashboard(panels, panelsPerRow=2)
+    assert set(gridPos["y"] for gridPos in gridPositions(d)) == {0}
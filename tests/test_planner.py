@@ -0,0 +1,83 @@
+"""
+Tests for the query planner: which queries are merged, what merged targets add up, and that
+panels imported from json keep their aliases and math.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import planner
+import serializer
+from dashboard import DashBoard
+from panel import GraphPanel, MathStatPanel, Query
+
+hosts = ["abra", "charmander", "meowth"]
+users = "Number of logged in users"
+
+def functionNames(target):
+    """
+    Returns: list of the names of target's functions
+    """
+    return [function["def"]["name"] for function in target["functions"]]
+
+def usersPanel(math="abra+charmander+meowth"):
+    """
+    Returns: a MathStatPanel adding up the users of every host, each query aliased by its host
+    """
+    return MathStatPanel(title="users", queryArray=[Query(host, users, alias=host) for host in hosts], math=math)
+
+def test_mathSumMerged():
+    panel = usersPanel()
+    plan = planner.coalesce(panel)
+    dictionary = panel.getDictionary()
+    assert len(plan.merged)==1
+    assert dictionary["math"]=="sum1"
+    (target,) = dictionary["targets"]
+    assert target["host"]["filter"]=="/^(abra|charmander|meowth)$/"
+    assert functionNames(target)==["sumSeries", "setAlias"]
+    planner.uncoalesce(panel)
+    assert panel.getDictionary()["math"]=="abra+charmander+meowth"
+    assert len(panel.getDictionary()["targets"])==3
+
+def test_mathNotSumUntouched():
+    panel = usersPanel(math="abra*charmander-meowth")
+    before = serializer.dumps(panel.getDictionary())
+    plan = planner.coalesce(panel)
+    assert plan.merged==[]
+    assert panel.queryPlan==None
+    assert serializer.dumps(panel.getDictionary())==before
+
+def test_graphKeepsSeries():
+    panel = GraphPanel(title="load", queryArray=[Query(host, "Processor load") for host in hosts])
+    planner.coalesce(panel)
+    (target,) = panel.getDictionary()["targets"]
+    assert target["host"]["filter"]=="/^(abra|charmander|meowth)$/"
+    assert "sumSeries" not in functionNames(target)
+
+def test_graphAliasedUntouched():
+    panel = GraphPanel(title="load", queryArray=[Query(host, "Processor load", alias=host) for host in hosts])
+    plan = planner.coalesce(panel)
+    assert plan.merged==[]
+    assert len(panel.getDictionary()["targets"])==3
+
+def test_importedKeepsAliases():
+    d = DashBoard(title="users")
+    d.addPanels([usersPanel(math="abra*charmander-meowth")])
+    exported = d.exportToJSON()
+    imported = DashBoard(JSON=exported)
+    plans = imported.coalesceQueries()
+    assert [plan.merged for plan in plans]==[[]]
+    assert imported.exportToJSON()==exported
+    queries = imported.getPanels()[0].getQueries()
+    assert [query.getAlias() for query in queries]==hosts
+
+def test_importedSumMerged():
+    d = DashBoard(title="users")
+    d.addPanels([usersPanel()])
+    imported = DashBoard(JSON=d.exportToJSON())
+    imported.coalesceQueries()
+    panel = imported.getDictionary()["dashboard"]["panels"][0]
+    assert panel["math"]=="sum1"
+    assert len(panel["targets"])==1
@@ -0,0 +1,76 @@
+"""
+Tests for repeat detection and repeated panels: panels that only differ by host are folded into
+one RepeatedPanel, and hosts can still be found and removed.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import repeat
+from dashboard import DashBoard
+from panel import GraphPanel, RepeatedPanel, Query
+
+hosts = ["h%02d" % i for i in range(4)]
+
+def loadPanel(host):
+    """
+    Returns: a graph of host's processor load
+    """
+    return GraphPanel(title="%s load" % host, queryArray=[Query(host, "Processor load")])
+
+def variable(d, name="host"):
+    """
+    Returns: the values of the dashboard's template variable called name, without "All"
+    """
+    for entry in d.getDictionary()["dashboard"]["templating"]["list"]:
+        if entry["name"]==name:
+            return [option["value"] for option in entry["options"] if option["value"]!="$__all"]
+    return None
+
+def repeatedDashboard():
+    """
+    Returns: a dashboard holding one load panel per host, folded into a repeated panel, and an
+        ICMP ping panel for h00
+    """
+    d = DashBoard(title="repeat test")
+    panels = [loadPanel(host) for host in hosts]
+    panels.append(GraphPanel(title="ping", queryArray=[Query("h00", "ICMP ping")]))
+    d.addPanels(panels, repeat=True)
+    return d
+
+def test_findRepeats():
+    panels = [loadPanel(host) for host in hosts] + [GraphPanel(title="other", queryArray=[Query("x", "ICMP ping")])]
+    found = repeat.findRepeats(panels)
+    assert len(found)==2
+    assert isinstance(found[0], RepeatedPanel)
+    assert found[0].hosts==hosts
+    assert found[0].getTitle()=="$host load"
+    assert found[0].getQueries()==[Query("$host", "Processor load")]
+    assert found[1] is panels[-1]
+
+def test_differentShapesNotFolded():
+    panels = [loadPanel("a"), GraphPanel(title="b load", queryArray=[Query("b", "ICMP ping")])]
+    assert repeat.findRepeats(panels)==panels
+
+def test_variable():
+    d = repeatedDashboard()
+    assert variable(d)==hosts
+    assert len(d.getPanels())==2
+
+def test_findAndRemoveHost():
+    d = repeatedDashboard()
+    repeated = d.getPanels()[0]
+    assert d.findPanels(host="h01")==[repeated]
+    assert d.removePanels(hosts=["h01"])==1
+    assert repeated.hosts==["h00", "h02", "h03"]
+    assert variable(d)==["h00", "h02", "h03"]
+    assert d.findPanels(host="h01")==[]
+    assert len(d.getPanels())==2
+
+def test_removeLastHosts():
+    d = repeatedDashboard()
+    d.removePanelsByHost(hosts)
+    assert d.getPanels()==[]
+    assert variable(d)==None
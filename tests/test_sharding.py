@@ -0,0 +1,72 @@
+"""
+Tests for sharding: every panel lands on exactly one page within the limits, pages are stable
+when panels are added or the number of pages grows, and rows keep the panels in order.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import sharding
+from dashboard import DashBoard
+from panel import GraphPanel, Query
+
+def buildPanels(n, prefix="panel"):
+    """
+    Returns: n graph panels with one query each
+    """
+    return [GraphPanel(title="%s %s" % (prefix, i), queryArray=[Query("h%s" % i, "Processor load")]) for i in range(n)]
+
+def pageOf(pages):
+    """
+    Returns: dictionary of panel titles to the index of their page
+    """
+    return dict((panel.getTitle(), i) for i, page in enumerate(pages) for panel in page)
+
+def test_pagesWithinLimits():
+    panels = buildPanels(50)
+    pages = sharding.assignPages(panels, maxPanels=10)
+    assert sorted(panel.getTitle() for page in pages for panel in page)==sorted(panel.getTitle() for panel in panels)
+    assert all(len(page) <= 10 for page in pages)
+
+def test_addedPanelOnlyChangesItsPage():
+    panels = buildPanels(40)
+    before = pageOf(sharding.assignPages(panels, pageCount=5))
+    after = pageOf(sharding.assignPages(panels + buildPanels(1, "new"), pageCount=5))
+    assert all(after[title]==page for title, page in before.items())
+
+def test_growthOnlyMovesToNewPage():
+    panels = buildPanels(200)
+    for count in range(1, 12):
+        before = pageOf(sharding.assignPages(panels, pageCount=count))
+        after = pageOf(sharding.assignPages(panels, pageCount=count + 1))
+        moved = [title for title in before if before[title]!=after[title]]
+        assert all(after[title]==count for title in moved)
+        assert len(moved) < 2 * len(panels) / (count + 1)
+
+def test_shardPagesKeepUnchangedPages():
+    d = DashBoard(title="big")
+    d.addPanels(buildPanels(30))
+    before = [page.exportToJSON() for page in d.shard(pageCount=4)]
+    d.removePanelsByTitle(["panel 7"])
+    after = [page.exportToJSON() for page in d.shard(pageCount=4)]
+    assert sum(1 for old, new in zip(before, after) if old!=new)==1
+
+def test_rowsInOrder():
+    panels = buildPanels(25)
+    rows = sharding.assignRows(panels, maxPanels=10)
+    assert [len(row) for row in rows]==[10, 10, 5]
+    assert [panel for row in rows for panel in row]==panels
+
+def test_pagesKeepDashboardLinks():
+    d = DashBoard(title="big")
+    d.addPanels(buildPanels(30))
+    ownLink = {"title": "Runbook", "type": "link", "url": "http://wiki/runbook"}
+    d.getDictionary()["dashboard"]["links"] = [ownLink]
+    pages = d.shard(pageCount=3)
+    for page in pages:
+        links = page.getDictionary()["dashboard"]["links"]
+        assert links[0]==ownLink
+        assert [link["url"] for link in links[1:]]==["/d/%s" % other.uid for other in pages]
+    assert d.getDictionary()["dashboard"]["links"]==[ownLink]
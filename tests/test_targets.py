@@ -0,0 +1,25 @@
+"""
+Tests for the targets built from a panel's queries: every target has its own dicts, so changing
+one target leaves the other targets and every other panel alone.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "grafapy"))
+
+import serializer
+from panel import GraphPanel, Query
+
+def test_targetsShareNothing():
+    first = GraphPanel(title="first", queryArray=[Query("abra", "Processor load"), Query("kadabra", "Processor load")])
+    second = GraphPanel(title="second", queryArray=[Query("alakazam", "Processor load")])
+    before = serializer.dumps(second.getDictionary())
+    target = first.getDictionary()["targets"][0]
+    target["options"]["showDisabledItems"] = True
+    target["table"]["skipEmptyValues"] = True
+    target["application"]["filter"] = "CPU"
+    target["functions"][0]["def"]["params"].append({"name": "other", "type": "string"})
+    assert serializer.dumps(second.getDictionary())==before
+    assert first.getDictionary()["targets"][1]["options"]["showDisabledItems"]==False
+    assert first.getDictionary()["targets"][1]["application"]["filter"]==""